@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 from pathlib import Path
 import os
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'middlewares.PerformanceMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -117,6 +118,28 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing: PASSWORD_HASHER_POLICY picks the hasher for new hashes. The
+# others stay listed so existing hashes still verify; they are rehashed on login.
+PASSWORD_HASHER_POLICY = config('PASSWORD_HASHER_POLICY', default='pbkdf2')
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'utils.hashers.PBKDF2PasswordHasher',
+    'argon2': 'utils.hashers.Argon2PasswordHasher',
+    'scrypt': 'utils.hashers.ScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER_POLICY]] + [
+    path for policy, path in PASSWORD_HASHER_CLASSES.items() if policy != PASSWORD_HASHER_POLICY
+]
+PBKDF2_ITERATIONS = config('PBKDF2_ITERATIONS', cast=int, default=870000)
+ARGON2_TIME_COST = config('ARGON2_TIME_COST', cast=int, default=2)
+ARGON2_MEMORY_COST = config('ARGON2_MEMORY_COST', cast=int, default=102400)
+ARGON2_PARALLELISM = config('ARGON2_PARALLELISM', cast=int, default=8)
+SCRYPT_WORK_FACTOR = config('SCRYPT_WORK_FACTOR', cast=int, default=2 ** 14)
+SCRYPT_BLOCK_SIZE = config('SCRYPT_BLOCK_SIZE', cast=int, default=8)
+SCRYPT_PARALLELISM = config('SCRYPT_PARALLELISM', cast=int, default=1)
+# most password hashes computed at once; other requests wait for a slot
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', cast=int, default=os.cpu_count() or 1)
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -138,6 +161,60 @@ STATIC_URL = 'static/'
 JWT_SECRET = config('JWT_SECRET')
 JWT_ACCESS_TOKEN_EXP = config('JWT_ACCESS_TOKEN_EXP', cast=int)
 JWT_REFRESH_TOKEN_EXP = config('JWT_REFRESH_TOKEN_EXP', cast=int)
+# in-process cache of verified access tokens; TTL bounds how long a revoked token is still accepted
+AUTH_TOKEN_CACHE_SIZE = config('AUTH_TOKEN_CACHE_SIZE', cast=int, default=1024)
+AUTH_TOKEN_CACHE_TTL = config('AUTH_TOKEN_CACHE_TTL', cast=int, default=30)
+# also accept whitelist entries keyed by the full token, as written before the hashed keys;
+# turn off once every such entry has expired (whitelist entries live 6000 seconds)
+AUTH_LEGACY_WHITELIST_KEYS = config('AUTH_LEGACY_WHITELIST_KEYS', cast=bool, default=True)
+# refresh tokens (sessions) kept per user; logging in beyond it evicts the least recently used
+MAX_SESSIONS_PER_USER = config('MAX_SESSIONS_PER_USER', cast=int, default=10)
+
+# cache
+TAXONOMY_CACHE_TIMEOUT = config('TAXONOMY_CACHE_TIMEOUT', cast=int, default=60 * 60 * 24)
+# utils.redis.get_or_compute: early expiration strength, how long an expired value may
+# still be served while it is recomputed, and how long a recomputation holds its lock
+CACHE_EARLY_EXPIRATION_BETA = config('CACHE_EARLY_EXPIRATION_BETA', cast=float, default=1.0)
+CACHE_STALE_TIME = config('CACHE_STALE_TIME', cast=int, default=60)
+CACHE_COMPUTE_TIMEOUT = config('CACHE_COMPUTE_TIMEOUT', cast=int, default=10)
+# latest articles per category/subcategory on the home screen
+HOME_FEED_SIZE = config('HOME_FEED_SIZE', cast=int, default=10)
+# seconds a cached home feed lives, which bounds how long a rebuild that raced a write stays stale
+HOME_FEED_TIMEOUT = config('HOME_FEED_TIMEOUT', cast=int, default=300)
+
+# per-request timing middleware, Server-Timing header and /metrics
+PERF_METRICS_ENABLED = config('PERF_METRICS_ENABLED', cast=bool, default=False)
+# bearer token scrapers send to /metrics; without one /metrics is not served
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'utils.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# serve read-only list endpoints through utils.fast_serializer instead of ModelSerializer
+FAST_JSON_RENDERING = config('FAST_JSON_RENDERING', cast=bool, default=False)
+# minimum age in seconds before the in-process search index (used without MySQL FULLTEXT) is rebuilt
+SEARCH_INDEX_TTL = config('SEARCH_INDEX_TTL', cast=int, default=60)
+
+# bulk content ingestion
+CONTENT_BULK_MAX_ITEMS = config('CONTENT_BULK_MAX_ITEMS', cast=int, default=5000)
+CONTENT_BULK_BATCH_SIZE = config('CONTENT_BULK_BATCH_SIZE', cast=int, default=500)
+
+# resized variants of Content.image_file, generated by a background thread pool
+IMAGE_VARIANT_WIDTHS = config('IMAGE_VARIANT_WIDTHS', cast=Csv(int), default='320,640,1024')
+IMAGE_VARIANT_FORMATS = config('IMAGE_VARIANT_FORMATS', cast=Csv(), default='webp,jpeg')
+IMAGE_VARIANT_QUALITY = config('IMAGE_VARIANT_QUALITY', cast=int, default=80)
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', cast=int, default=2)
+
+# caching proxy for remote Content.image_url
+IMAGE_PROXY_CACHE_DIR = config('IMAGE_PROXY_CACHE_DIR', default=os.path.join(BASE_DIR, 'cache', 'images'))
+IMAGE_PROXY_CACHE_SIZE = config('IMAGE_PROXY_CACHE_SIZE', cast=int, default=512 * 1024 * 1024)
+IMAGE_PROXY_MAX_IMAGE_SIZE = config('IMAGE_PROXY_MAX_IMAGE_SIZE', cast=int, default=10 * 1024 * 1024)
+IMAGE_PROXY_MAX_AGE = config('IMAGE_PROXY_MAX_AGE', cast=int, default=60 * 60 * 24)
+IMAGE_PROXY_TIMEOUT = config('IMAGE_PROXY_TIMEOUT', cast=float, default=10)
 
 
 # Default primary key field type
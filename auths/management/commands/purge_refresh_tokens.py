@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from auths.sessions import purge_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired and revoked refresh tokens in primary key ranges.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.1, help='Seconds to pause between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Report row counts without deleting.')
+
+    def handle(self, *args, **options):
+        counts = purge_sessions(options['batch_size'], options['sleep'], options['dry_run'])
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {counts['expired']} expired and {counts['revoked']} revoked refresh tokens."
+        ))
@@ -1,4 +1,4 @@
-from home.models import User
+from home.models import User, RefreshToken
 from rest_framework import serializers
 import re
 
@@ -32,6 +32,7 @@ class AuthSerializer(serializers.Serializer):
     email = serializers.EmailField(required=True)
     password = serializers.CharField(
         write_only=True, required=True, min_length=6)
+    device_name = serializers.CharField(required=False, allow_blank=True, max_length=255)
 
 
 class UserDataSerializer(serializers.ModelSerializer):
@@ -50,3 +51,9 @@ class UserDataSerializer(serializers.ModelSerializer):
 
 class RefreshTokenSerializer(serializers.Serializer):
     refresh_token = serializers.CharField(required=True, min_length=6,)
+
+
+class SessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RefreshToken
+        fields = ['id', 'device_name', 'user_agent', 'ip_address', 'created_at', 'last_used_at', 'expires_at']
@@ -0,0 +1,134 @@
+import time
+from datetime import datetime, timezone
+
+from django.db.models import Count, Q
+
+from home.models import RefreshToken
+from middlewares import forget_tokens
+from utils.jwt import hash_token
+from utils.redis import token_key, whitelist_token, revoke_token_keys
+from PythonWeb.settings import MAX_SESSIONS_PER_USER
+
+# How long an access token stays whitelisted after it is issued.
+ACCESS_TOKEN_WHITELIST_TIME = 6000
+
+SESSION_FIELDS = ['id', 'device_name', 'user_agent', 'ip_address', 'created_at', 'last_used_at', 'expires_at']
+
+
+def device_metadata(request, device_name=''):
+    """
+    What a session records about the client that opened it.
+    """
+    return {
+        'device_name': (device_name or request.headers.get('X-Device-Name', ''))[:255],
+        'user_agent': request.headers.get('User-Agent', '')[:255],
+        'ip_address': request.META.get('REMOTE_ADDR') or None,
+    }
+
+
+def create_session(user, refresh_token, access_token, expires_at, device):
+    """
+    Store a new session for the user and whitelist its access token. Sessions
+    beyond MAX_SESSIONS_PER_USER are revoked, least recently used first.
+    """
+    now = datetime.now(timezone.utc)
+    RefreshToken.objects.create(
+        user=user, token=refresh_token, expires_at=expires_at, last_used_at=now,
+        access_token_key=token_key(access_token), **device,
+    )
+    whitelist_token(access_token, ACCESS_TOKEN_WHITELIST_TIME)
+
+    stale = list(
+        RefreshToken.objects.filter(user=user).order_by('-last_used_at', '-created_at')
+        .values_list('id', 'access_token_key')[MAX_SESSIONS_PER_USER:]
+    )
+    if stale:
+        _revoke([session_id for session_id, _ in stale], [key for _, key in stale])
+
+
+def get_session(refresh_token):
+    """
+    The live session a refresh token belongs to, with the user fields needed to
+    issue an access token, or None.
+    """
+    return (
+        RefreshToken.objects.select_related('user')
+        .only('id', 'access_token_key', 'user__id', 'user__is_staff')
+        .filter(token_hash=hash_token(refresh_token)).first()
+    )
+
+
+def touch_session(session, access_token):
+    """
+    Mark the session used and make access_token its access token. The one it
+    replaces stops being accepted.
+    """
+    RefreshToken.objects.filter(id=session.id).update(
+        access_token_key=token_key(access_token), last_used_at=datetime.now(timezone.utc)
+    )
+    if session.access_token_key:
+        revoke_token_keys([session.access_token_key])
+        forget_tokens([session.access_token_key])
+    whitelist_token(access_token, ACCESS_TOKEN_WHITELIST_TIME)
+
+
+def list_sessions(user_id):
+    return RefreshToken.objects.filter(user_id=user_id).order_by('-last_used_at').only(*SESSION_FIELDS)
+
+
+def revoke_sessions(user_id, session_ids=None, exclude=None):
+    """
+    Revoke the user's sessions, all of them or only session_ids, keeping
+    exclude. Returns how many were revoked.
+    """
+    sessions = RefreshToken.objects.filter(user_id=user_id)
+    if session_ids is not None:
+        sessions = sessions.filter(id__in=session_ids)
+    if exclude is not None:
+        sessions = sessions.exclude(id=exclude)
+    rows = list(sessions.values_list('id', 'access_token_key'))
+    if rows:
+        _revoke([session_id for session_id, _ in rows], [key for _, key in rows])
+    return len(rows)
+
+
+def _revoke(session_ids, access_token_keys):
+    # One UPDATE for the rows and one delete_many for the whitelisted access tokens.
+    # Other processes may accept the access tokens for up to AUTH_TOKEN_CACHE_TTL more seconds.
+    keys = [key for key in access_token_keys if key]
+    RefreshToken.objects.filter(id__in=session_ids).soft_delete()
+    revoke_token_keys(keys)
+    forget_tokens(keys)
+
+
+def purge_sessions(batch_size=1000, sleep=0.1, dry_run=False):
+    """
+    Hard-delete expired and revoked sessions. The table is walked in primary key
+    windows of batch_size rows, so each DELETE locks a bounded key range, with
+    a pause of `sleep` seconds between windows. Returns the rows found per kind;
+    with dry_run nothing is deleted.
+    """
+    now = datetime.now(timezone.utc)
+    expired = Q(is_deleted=False, expires_at__lte=now)
+    revoked = Q(is_deleted=True)
+    counts = {'expired': 0, 'revoked': 0}
+    rows = RefreshToken.all_objects.order_by('pk')
+    last_pk = None
+
+    while True:
+        window = rows if last_pk is None else rows.filter(pk__gt=last_pk)
+        upper = list(window.values_list('pk', flat=True)[batch_size - 1:batch_size])
+        if upper:
+            window = window.filter(pk__lte=upper[0])
+
+        found = window.aggregate(expired=Count('pk', filter=expired), revoked=Count('pk', filter=revoked))
+        if not dry_run and (found['expired'] or found['revoked']):
+            window.filter(expired | revoked).delete()
+        counts['expired'] += found['expired']
+        counts['revoked'] += found['revoked']
+
+        if not upper:
+            return counts
+        last_pk = upper[0]
+        if sleep:
+            time.sleep(sleep)
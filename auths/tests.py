@@ -1,3 +1,296 @@
-from django.test import TestCase
+import time
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+import jwt
+
+import middlewares
+from home.models import User, RefreshToken
+from auths import sessions
+from utils.jwt import generate_access_token, hash_token
+from utils.redis import is_token_whitelisted, whitelist_token, remove_cache, token_key
+from PythonWeb.settings import AUTH_TOKEN_CACHE_TTL, JWT_SECRET
 
 # Create your tests here.
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='nguoidung', email='user@example.com', password='mat-khau-1')
+
+    def login(self):
+        return self.client.post(
+            '/api/auth/login', {'email': 'user@example.com', 'password': 'mat-khau-1'}, content_type='application/json'
+        )
+
+    def test_login_queries(self):
+        with self.assertNumQueries(3):
+            first = self.login()
+        with self.assertNumQueries(3):
+            second = self.login()
+
+        self.assertEqual(second.status_code, 200)
+        data = second.json()['data']
+        self.assertEqual(data['data']['email'], 'user@example.com')
+        self.assertNotIn('password', data['data'])
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(RefreshToken.objects.filter(user=self.user, token=data['refresh_token']).exists())
+
+    def test_wrong_password(self):
+        response = self.client.post(
+            '/api/auth/login', {'email': 'user@example.com', 'password': 'sai-mat-khau'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['message'], 'Password is incorrect')
+
+
+@override_settings(PBKDF2_ITERATIONS=1000, SCRYPT_WORK_FACTOR=2 ** 8, PASSWORD_HASHERS=[
+    'utils.hashers.PBKDF2PasswordHasher', 'utils.hashers.ScryptPasswordHasher',
+])
+class PasswordHasherPolicyTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='nguoidung', email='user@example.com', password='mat-khau-1')
+
+    def login(self, password='mat-khau-1'):
+        return self.client.post(
+            '/api/auth/login', {'email': 'user@example.com', 'password': password}, content_type='application/json'
+        )
+
+    def test_rehash_when_parameters_change(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    def test_rehash_when_policy_changes(self):
+        with self.settings(PASSWORD_HASHERS=['utils.hashers.ScryptPasswordHasher', 'utils.hashers.PBKDF2PasswordHasher']):
+            self.assertEqual(self.login('sai-mat-khau').status_code, 404)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('pbkdf2_sha256$'))
+
+            self.assertEqual(self.login().status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith('scrypt$'))
+            self.assertEqual(self.login().status_code, 200)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class RefreshTokenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='nguoidung', email='user@example.com', password='mat-khau-1')
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh_token', {'refresh_token': token}, content_type='application/json')
+
+    def test_refresh_by_token_hash(self):
+        login = self.client.post(
+            '/api/auth/login', {'email': 'user@example.com', 'password': 'mat-khau-1'}, content_type='application/json'
+        )
+        token = login.json()['data']['refresh_token']
+        stored = RefreshToken.objects.get(token=token)
+        self.assertEqual(stored.token_hash, hash_token(token))
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token_hash', captured.captured_queries[0]['sql'])
+        self.assertIn('token_hash', RefreshToken.objects.filter(token_hash=stored.token_hash).explain())
+
+        self.assertEqual(self.refresh(token + 'x').status_code, 401)
+
+    def test_save_keeps_hash_in_sync(self):
+        stored = RefreshToken.objects.create(user=self.user, token='a', expires_at='2100-01-01T00:00:00Z')
+        stored.token = 'b'
+        stored.save(update_fields=['token'])
+        stored.refresh_from_db()
+        self.assertEqual(stored.token_hash, hash_token('b'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class SessionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='nguoidung', email='user@example.com', password='mat-khau-1')
+
+    def login(self, device_name):
+        response = self.client.post(
+            '/api/auth/login', {'email': 'user@example.com', 'password': 'mat-khau-1', 'device_name': device_name},
+            content_type='application/json', HTTP_USER_AGENT='TestAgent/1.0',
+        )
+        return response.json()['data']
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh_token', {'refresh_token': token}, content_type='application/json')
+
+    def test_sessions_per_device(self):
+        phone = self.login('phone')
+        laptop = self.login('laptop')
+        self.assertEqual(self.refresh(phone['refresh_token']).status_code, 200)
+        self.assertEqual(self.refresh(laptop['refresh_token']).status_code, 200)
+
+        response = self.client.get('/api/auth/sessions', HTTP_AUTHORIZATION=f"Bearer {phone['access_token']}")
+        listed = response.json()['data']
+        self.assertEqual([session['device_name'] for session in listed], ['laptop', 'phone'])
+        self.assertEqual(listed[0]['user_agent'], 'TestAgent/1.0')
+        self.assertEqual(listed[0]['ip_address'], '127.0.0.1')
+
+    def test_least_recently_used_session_is_evicted(self):
+        with mock.patch.object(sessions, 'MAX_SESSIONS_PER_USER', 2):
+            first = self.login('first')
+            second = self.login('second')
+            self.refresh(first['refresh_token'])
+            self.login('third')
+
+        self.assertEqual(RefreshToken.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self.refresh(second['refresh_token']).status_code, 401)
+        self.assertFalse(is_token_whitelisted(second['access_token']))
+        self.assertEqual(self.refresh(first['refresh_token']).status_code, 200)
+
+    def test_revoke_all_sessions(self):
+        first = self.login('first')
+        second = self.login('second')
+
+        with self.assertNumQueries(2):
+            response = self.client.delete('/api/auth/sessions', HTTP_AUTHORIZATION=f"Bearer {first['access_token']}")
+        self.assertEqual(response.json()['data'], {'revoked': 2})
+        for session in (first, second):
+            self.assertEqual(self.refresh(session['refresh_token']).status_code, 401)
+            self.assertFalse(is_token_whitelisted(session['access_token']))
+        self.assertEqual(RefreshToken.all_objects.filter(user=self.user, is_deleted=True).count(), 2)
+
+    def test_revoked_access_token_is_refused_at_once(self):
+        first = self.login('first')
+        second = self.login('second')
+        for session in (first, second):
+            self.assertEqual(self.client.get('/api/auth/me', HTTP_AUTHORIZATION=f"Bearer {session['access_token']}").status_code, 200)
+
+        self.client.delete("/api/auth/sessions", HTTP_AUTHORIZATION=f"Bearer {first['access_token']}")
+        for session in (first, second):
+            self.assertEqual(self.client.get('/api/auth/me', HTTP_AUTHORIZATION=f"Bearer {session['access_token']}").status_code, 401)
+
+    def test_change_password_keeps_only_current_session(self):
+        first = self.login('first')
+        second = self.login('second')
+
+        response = self.client.patch(
+            '/api/auth/password',
+            {'current_password': 'mat-khau-1', 'new_password': 'mat-khau-2', 'refresh_token': first['refresh_token']},
+            content_type='application/json', HTTP_AUTHORIZATION=f"Bearer {first['access_token']}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(second['refresh_token']).status_code, 401)
+        self.assertEqual(RefreshToken.objects.get(user=self.user).device_name, 'first')
+        self.assertEqual(self.refresh(first['refresh_token']).status_code, 200)
+
+
+class PurgeRefreshTokensTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='nguoidung', email='user@example.com', password='mat-khau-1')
+        now = datetime.now(timezone.utc)
+        RefreshToken.objects.bulk_create(
+            [RefreshToken(user=user, token=f'live-{i}', expires_at=now + timedelta(days=1)) for i in range(3)]
+            + [RefreshToken(user=user, token=f'expired-{i}', expires_at=now - timedelta(days=1)) for i in range(4)]
+            + [RefreshToken(user=user, token=f'revoked-{i}', expires_at=now + timedelta(days=1), is_deleted=True)
+               for i in range(2)]
+        )
+
+    def purge(self, *args):
+        out = StringIO()
+        call_command('purge_refresh_tokens', '--batch-size', '2', '--sleep', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_only_counts(self):
+        self.assertIn('Would delete 4 expired and 2 revoked', self.purge('--dry-run'))
+        self.assertEqual(RefreshToken.all_objects.count(), 9)
+
+    def test_purge_keeps_live_tokens(self):
+        self.assertIn('Deleted 4 expired and 2 revoked', self.purge())
+        self.assertEqual(
+            sorted(RefreshToken.all_objects.values_list('token', flat=True)), ['live-0', 'live-1', 'live-2']
+        )
+
+
+class VerifiedTokenCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='nguoidung', email='user@example.com', password='mat-khau-1')
+
+    def setUp(self):
+        cache.clear()
+        middlewares.verified_tokens.clear()
+        self.token = generate_access_token(self.user.id, False)
+        whitelist_token(self.token, 6000)
+
+    def me(self, token):
+        return self.client.get('/api/auth/me', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def cached_expiry(self):
+        [(_, expires_at)] = middlewares.verified_tokens._data.values()
+        return expires_at
+
+    def test_hit_skips_whitelist_lookup(self):
+        with mock.patch.object(middlewares, 'is_token_whitelisted', wraps=is_token_whitelisted) as lookup:
+            self.assertEqual(self.me(self.token).status_code, 200)
+            self.assertEqual(self.me(self.token).status_code, 200)
+        self.assertEqual(lookup.call_count, 1)
+
+    def test_entry_expires_at_ttl_or_token_exp(self):
+        start = time.time()
+        self.me(self.token)
+        self.assertAlmostEqual(self.cached_expiry(), start + AUTH_TOKEN_CACHE_TTL, delta=2)
+
+        middlewares.verified_tokens.clear()
+        exp = int(start) + AUTH_TOKEN_CACHE_TTL // 2
+        short = jwt.encode({'id': str(self.user.id), 'role': False, 'exp': exp}, key=JWT_SECRET, algorithm='HS256')
+        whitelist_token(short, 6000)
+        self.assertEqual(self.me(short).status_code, 200)
+        self.assertEqual(self.cached_expiry(), exp)
+
+    def test_revoked_token_rejected_once_ttl_lapses(self):
+        self.assertEqual(self.me(self.token).status_code, 200)
+        remove_cache(token_key(self.token))
+        self.assertEqual(self.me(self.token).status_code, 200)
+
+        later = time.time() + AUTH_TOKEN_CACHE_TTL + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(self.me(self.token).status_code, 401)
+
+
+class TokenWhitelistTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hashed_keys(self):
+        self.assertEqual(token_key('a.b.c'), token_key('a.b.c'))
+        self.assertNotEqual(token_key('a.b.c'), token_key('a.b.d'))
+        self.assertEqual(len(token_key('x' * 1000)), len('access_token:') + 32)
+
+        whitelist_token('a.b.c', 60)
+        self.assertTrue(is_token_whitelisted('a.b.c'))
+        self.assertFalse(is_token_whitelisted('a.b.d'))
+        remove_cache(token_key('a.b.c'))
+        self.assertFalse(is_token_whitelisted('a.b.c'))
+
+    def test_legacy_keys_during_transition(self):
+        cache.set('access_token:a.b.c', '"a.b.c"', 60)
+        self.assertTrue(is_token_whitelisted('a.b.c'))
+        with mock.patch('utils.redis.AUTH_LEGACY_WHITELIST_KEYS', False):
+            self.assertFalse(is_token_whitelisted('a.b.c'))
@@ -6,5 +6,7 @@ urlpatterns = [
     path('register', register),  
     path('me', profile_view, name='get_update_profile'),  
     path('password', change_password),
-    path('refresh_token', refresh_token)
+    path('refresh_token', refresh_token),
+    path('sessions', sessions_view),
+    path('sessions/<uuid:pk>', session_detail),
 ]
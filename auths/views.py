@@ -7,9 +7,10 @@ from rest_framework import status
 from utils.jwt import decode_token, generate_access_token, generate_refresh_token
 from home.models import User, RefreshToken
 from home.serializers import UserSerializers
-from auths.serializers import AuthSerializer, UserDataSerializer, RegisterSerializer, UpdateUserSerializer, ChangePasswordSerializer, RefreshTokenSerializer
+from auths.serializers import AuthSerializer, UserDataSerializer, RegisterSerializer, UpdateUserSerializer, ChangePasswordSerializer, RefreshTokenSerializer, SessionSerializer
+from auths.sessions import device_metadata, create_session, get_session, touch_session, list_sessions, revoke_sessions
 from middlewares import auth_middleware
-from utils.redis import set_cache
+from utils.hashers import check_password, make_password
 from utils.response import success_response, failure_response
 import jwt
 from PythonWeb.settings import JWT_SECRET
@@ -18,6 +19,10 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.shortcuts import get_object_or_404
 
 
+# Everything login reads: the password check, the token claims and UserDataSerializer.
+LOGIN_USER_FIELDS = ['id', 'password', 'is_staff', 'username', 'first_name', 'last_name', 'email', 'date_joined']
+
+
 @swagger_auto_schema(
     method='POST',
     operation_description="Login by Email",
@@ -45,31 +50,18 @@ def login(request, *args, **kwargs):
     password = serializer.validated_data['password']
 
     try:
-        user = User.objects.get(email=email)
-        if user.check_password(password) == False:
-            return failure_response(data={"message": "Password is incorrect"}, status_code=status.HTTP_404_NOT_FOUND)
-
-        user_data = UserSerializers(user).data
+        user = User.objects.only(*LOGIN_USER_FIELDS).get(email=email)
+        if check_password(user, password) == False:
+            return failure_response(message="Password is incorrect", status_code=status.HTTP_404_NOT_FOUND)
 
-        access_token = generate_access_token(
-            user_data['id'], user_data['is_staff'])
-        refresh_token = generate_refresh_token(user_data['id'])
+        access_token = generate_access_token(user.id, user.is_staff)
+        refresh_token = generate_refresh_token(user.id)
 
         expires_at = datetime.now(timezone.utc) + timedelta(days=30)
-
-        is_existed_fresh_token = RefreshToken.objects.filter(user=user).first()
-
-        if not is_existed_fresh_token:
-            new_refresh_token = RefreshToken.objects.create(
-                user=user, expires_at=expires_at, token=refresh_token)
-            new_refresh_token.save()
-        else:
-            is_existed_fresh_token.token = refresh_token
-            is_existed_fresh_token.expires_at = expires_at
-            is_existed_fresh_token.save()
+        device = device_metadata(request, serializer.validated_data.get('device_name', ''))
+        create_session(user, refresh_token, access_token, expires_at, device)
 
         profile = UserDataSerializer(user).data
-        set_cache(f'access_token:{access_token}', access_token, 6000)
         return success_response(data={'access_token': access_token, 'refresh_token': refresh_token, 'data': profile}, status_code=200)
     except User.DoesNotExist:
         return success_response(data={"message": "Not found user"}, status_code=status.HTTP_404_NOT_FOUND)
@@ -101,7 +93,7 @@ def register(request, *args, **kwargs):
         email=email,
         is_staff=False
     )
-    new_user.set_password(password)
+    new_user.password = make_password(password)
     new_user.save()
 
     user_data = UserSerializers(new_user).data
@@ -176,20 +168,23 @@ def change_password(request, *args, **kwargs):
     except jwt.InvalidTokenError:
         return failure_response(message="Invalid Refresh Token", status_code=status.HTTP_401_UNAUTHORIZED)
 
+    session = get_session(refresh_token)
+    if not session or str(session.user_id) != str(user_id):
+        return failure_response(message="Invalid Refresh Token", status_code=status.HTTP_401_UNAUTHORIZED)
+
     user = get_object_or_404(User, id=user_id)
 
-    if not user.check_password(current_password):
+    if not check_password(user, current_password):
         return failure_response(message='Current password is incorrect', status_code=status.HTTP_400_BAD_REQUEST)
 
-    user.set_password(new_password)
+    user.password = make_password(new_password)
     user.save()
 
-    old_refresh_token = get_object_or_404(RefreshToken, user_id=user_id)
-    old_refresh_token.token = generate_refresh_token(user_id)
-    old_refresh_token.save()
+    # Every other device has to log in again with the new password.
+    revoke_sessions(user_id, exclude=session.id)
 
     user_data = UserDataSerializer(user).data
-    return success_response(status=status.HTTP_200_OK, data=user_data)
+    return success_response(status_code=status.HTTP_200_OK, data=user_data)
 
 @swagger_auto_schema(
     method='POST',
@@ -207,20 +202,61 @@ def refresh_token(request, *args, **kwargs):
 
     refresh_token = serializer.validated_data['refresh_token']
 
-    old_refresh_token = RefreshToken.objects.filter(token=refresh_token).first()
-    if not old_refresh_token:
+    session = get_session(refresh_token)
+    if not session or session.user is None:
         return failure_response(status_code=status.HTTP_401_UNAUTHORIZED, message="Invalid refresh token")
 
     try:
         decoded = decode_token(refresh_token)
-        user = get_object_or_404(User, id=decoded['id'])
+        user = session.user
         new_access_token = generate_access_token(id=decoded['id'], role=user.is_staff)
-        
-        set_cache(f'access_token:{new_access_token}', new_access_token, 6000)
+
+        touch_session(session, new_access_token)
 
         return success_response(status_code=200, data={"new_access_token": new_access_token})
 
     except jwt.ExpiredSignatureError:
         return failure_response(message="Refresh Token expired", status_code=status.HTTP_401_UNAUTHORIZED)
     except jwt.InvalidTokenError:
-        return failure_response(message="Invalid Refresh Token", status_code=status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        return failure_response(message="Invalid Refresh Token", status_code=status.HTTP_401_UNAUTHORIZED)
+
+
+@swagger_auto_schema(
+    method='GET',
+    operation_description="List active sessions",
+    tags=["Auth"],
+    responses={},
+    security=[{"Bearer": []}],
+)
+@swagger_auto_schema(
+    method='DELETE',
+    operation_description="Log out of every device. Revoked access tokens stop working at once on the server that handles this request, and within AUTH_TOKEN_CACHE_TTL seconds on the others.",
+    tags=["Auth"],
+    responses={},
+    security=[{"Bearer": []}],
+)
+@api_view(['GET', 'DELETE'])
+@auth_middleware
+def sessions_view(request, *args, **kwargs):
+    user_id = request.user['id']
+
+    if request.method == 'GET':
+        return success_response(data=SessionSerializer(list_sessions(user_id), many=True).data)
+
+    revoked = revoke_sessions(user_id)
+    return success_response(data={'revoked': revoked})
+
+
+@swagger_auto_schema(
+    method='DELETE',
+    operation_description="Log out of one device. Revoked access tokens stop working at once on the server that handles this request, and within AUTH_TOKEN_CACHE_TTL seconds on the others.",
+    tags=["Auth"],
+    responses={},
+    security=[{"Bearer": []}],
+)
+@api_view(['DELETE'])
+@auth_middleware
+def session_detail(request, pk, *args, **kwargs):
+    if not revoke_sessions(request.user['id'], session_ids=[pk]):
+        return failure_response(message="Session not found", status_code=status.HTTP_404_NOT_FOUND)
+    return success_response(data={'revoked': 1})
@@ -0,0 +1,80 @@
+"""
+Password hashing cost and logins per core under each PASSWORD_HASHER_POLICY.
+
+    python -m benchmarks.hashers --logins 20 --policies pbkdf2,argon2,scrypt
+
+Logins run one at a time, so logins_per_s is the rate a single core sustains.
+verify_ms is check_password() alone and hash_ms is make_password().
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.utils import best_of, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=20, help='Per policy.')
+    parser.add_argument('--policies', default='pbkdf2,argon2,scrypt')
+    args = parser.parse_args()
+
+    os.environ.setdefault('BENCHMARK_DATABASE', os.path.join(tempfile.mkdtemp(prefix='hashers-'), 'db.sqlite3'))
+    setup()
+
+    from django.conf import settings
+    from django.test import override_settings
+
+    results = []
+    for policy in args.policies.split(','):
+        hasher_path = settings.PASSWORD_HASHER_CLASSES[policy]
+        hasher_paths = [hasher_path] + [path for path in settings.PASSWORD_HASHER_CLASSES.values() if path != hasher_path]
+        # Assigning settings.PASSWORD_HASHERS would not reach the cached get_hashers();
+        # override_settings() sends setting_changed, which clears it.
+        with override_settings(PASSWORD_HASHERS=hasher_paths):
+            results.append(measure(policy, args.logins))
+
+    print(json.dumps({'cpus': os.cpu_count(), 'results': results}, indent=2))
+
+
+def measure(policy, logins):
+    from django.contrib.auth.hashers import get_hasher, identify_hasher
+    from django.test import Client
+    from home.models import User
+    from utils.hashers import check_password, make_password
+
+    try:
+        hasher = get_hasher()
+        hasher.salt()
+        make_password('warm-up')
+    except ValueError as error:
+        return {'policy': policy, 'skipped': str(error)}
+
+    User.objects.all().delete()
+    user = User.objects.create(
+        username='user', email='user@example.com', password=make_password('benchmark-password')
+    )
+    assert identify_hasher(user.password).algorithm == hasher.algorithm, user.password
+    hash_s = best_of(lambda: make_password('benchmark-password'))
+    verify_s = best_of(lambda: check_password(user, 'benchmark-password'))
+
+    client = Client()
+    body = json.dumps({'email': 'user@example.com', 'password': 'benchmark-password'})
+    start = time.perf_counter()
+    for _ in range(logins):
+        response = client.post('/api/auth/login', body, content_type='application/json')
+        assert response.status_code == 200, response.content
+    wall = time.perf_counter() - start
+    return {
+        'policy': policy,
+        'algorithm': hasher.algorithm,
+        'hash_ms': round(hash_s * 1000, 2),
+        'verify_ms': round(verify_s * 1000, 2),
+        'logins_per_s': round(logins / wall, 1),
+    }
+
+
+if __name__ == '__main__':
+    main()
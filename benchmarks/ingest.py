@@ -0,0 +1,60 @@
+"""
+Content ingestion throughput: one POST per article vs /api/contents/bulk/.
+
+    python -m benchmarks.ingest --items 2000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.utils import setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.test import Client
+    from home.models import Category, SubCategory, Content
+
+    category = Category.objects.create(name='Thời sự')
+    subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=category)
+    items = [
+        {
+            'title': f'Bài viết {i}', 'content': 'Nội dung ' * 50, 'author': 'Tác giả',
+            'image_url': 'https://example.com/a.png',
+            'subcategory_id': subcategory.id, 'category_id': category.id,
+        }
+        for i in range(args.items)
+    ]
+    client = Client()
+
+    start = time.perf_counter()
+    for item in items:
+        response = client.post('/api/contents/', json.dumps(item), content_type='application/json')
+        assert response.status_code == 201, response.content
+    single = time.perf_counter() - start
+    Content.objects.all().delete()
+
+    ndjson = '\n'.join(json.dumps(item) for item in items)
+    start = time.perf_counter()
+    response = client.post(
+        f'/api/contents/bulk/?batch_size={args.batch_size}', ndjson, content_type='application/x-ndjson'
+    )
+    bulk = time.perf_counter() - start
+    assert response.json()['created'] == args.items, response.content
+
+    print(json.dumps({
+        'items': args.items,
+        'single_items_per_s': round(args.items / single),
+        'bulk_items_per_s': round(args.items / bulk),
+        'speedup': round(single / bulk, 1),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,403 @@
+"""
+Load test for every route in home.urls, home.async_urls and auths.urls.
+
+Seeds a synthetic dataset on SQLite, then sends each scenario's requests
+through the Django test client (WSGI, one client per thread) and the
+in-process ASGI client at each concurrency level. Reports throughput,
+p50/p95/p99 latency, status codes and database queries per request (read
+from the Server-Timing header) as JSON.
+
+    python -m benchmarks.loadtest --contents 2000 --concurrency 1,8,32 --output result.json
+    python -m benchmarks.loadtest --save-baseline baseline.json
+    python -m benchmarks.loadtest --baseline baseline.json --tolerance 0.25
+
+With --baseline the run exits with status 1 when a scenario got slower or
+less throughput than the tolerance allows, or ran more queries or had more
+server errors than in the baseline.
+"""
+import argparse
+import asyncio
+import http.server
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import percentile, setup
+
+Request = namedtuple('Request', 'method path body headers', defaults=(None, None))
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def start_image_origin():
+    """
+    Local stand-in for the third-party hosts behind Content.image_url.
+    """
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), 'red').save(buffer, format='PNG')
+    body = buffer.getvalue()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/png')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Dataset:
+    """
+    Synthetic users, categories, subcategories, contents and comments.
+    """
+
+    def __init__(self, args, image_origin):
+        from django.contrib.auth.hashers import make_password
+        from home.models import Category, SubCategory, Content, Comment, User, RefreshToken
+        from utils.jwt import generate_access_token, generate_refresh_token
+        from utils.redis import whitelist_token
+
+        self.password = 'benchmark-password'
+        password = make_password(self.password)
+        User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', password=password)
+            for i in range(args.users)
+        ])
+        # Login rotates the refresh token, so it signs in as another user.
+        self.user, self.login_user = User.objects.order_by('id')[:2]
+        self.access_token = generate_access_token(self.user.id, self.user.is_staff)
+        whitelist_token(self.access_token, 60 * 60)
+        self.refresh_token = generate_refresh_token(self.user.id)
+        RefreshToken.objects.create(
+            user=self.user, token=self.refresh_token, expires_at='2100-01-01T00:00:00Z',
+        )
+
+        words = ['bóng', 'đá', 'kinh', 'tế', 'thời', 'sự', 'giá', 'vàng', 'thế', 'giới', 'công', 'nghệ']
+        Category.objects.bulk_create([Category(name=f'Danh mục {i}') for i in range(args.categories)])
+        self.category_ids = list(Category.objects.values_list('id', flat=True))
+        SubCategory.objects.bulk_create([
+            SubCategory(sub=f'Chuyên mục {category_id}.{j}', description='Mô tả', category_id=category_id)
+            for category_id in self.category_ids for j in range(args.subcategories)
+        ])
+        subcategories = list(SubCategory.objects.values_list('id', 'category_id'))
+        self.subcategory_ids = [pk for pk, _ in subcategories]
+        origin = f'http://127.0.0.1:{image_origin.server_port}'
+        Content.objects.bulk_create([
+            Content(
+                title=' '.join(words[(i + k) % len(words)] for k in range(4)),
+                content=' '.join(words[(i * k) % len(words)] for k in range(60)),
+                image_url=f'{origin}/{i}.png', author='Tác giả', comment_count=args.comments,
+                subcategory_id=subcategories[i % len(subcategories)][0],
+                category_id=subcategories[i % len(subcategories)][1],
+            )
+            for i in range(args.contents)
+        ], batch_size=500)
+        self.content_ids = list(Content.objects.values_list('id', flat=True))
+        Comment.objects.bulk_create([
+            Comment(title=f'Bình luận {j}', author='Độc giả', content_id=content_id)
+            for content_id in self.content_ids for j in range(args.comments)
+        ], batch_size=1000)
+        self.comment_ids = list(Comment.objects.values_list('id', flat=True))
+        self.sizes = {
+            'users': args.users, 'categories': len(self.category_ids), 'subcategories': len(self.subcategory_ids),
+            'contents': len(self.content_ids), 'comments': len(self.comment_ids),
+        }
+
+    def pick(self, ids, i):
+        return ids[(i * 7919) % len(ids)]
+
+    def content_body(self, i):
+        return {
+            'title': f'Bài viết mới {i}', 'content': 'Nội dung ' * 50, 'author': 'Tác giả',
+            'image_url': 'https://example.com/a.png',
+            'subcategory_id': self.pick(self.subcategory_ids, i), 'category_id': self.pick(self.category_ids, i),
+        }
+
+    def auth(self):
+        return {'Authorization': f'Bearer {self.access_token}'}
+
+
+def create_rows(model, count, **fields):
+    model.objects.bulk_create([model(**fields) for _ in range(count)])
+    return list(model.objects.order_by('-id').values_list('id', flat=True)[:count])
+
+
+def scenarios(data):
+    """
+    (name, builder, scale) for each route and method. A builder returns `n`
+    requests; rows that a scenario deletes are created up front. `scale`
+    shrinks the request count of routes dominated by password hashing.
+    """
+    from home.models import Category, SubCategory, Content, Comment, RefreshToken
+
+    pick = data.pick
+    subcategory_id, category_id = data.subcategory_ids[0], data.category_ids[0]
+
+    def get(path):
+        return lambda n: [Request('GET', path(i)) for i in range(n)]
+
+    def send(method, path, body, headers=None):
+        return lambda n: [Request(method, path(i), json.dumps(body(i)), headers) for i in range(n)]
+
+    def delete(model, path, **fields):
+        return lambda n: [Request('DELETE', path(pk)) for pk in create_rows(model, n, **fields)]
+
+    def revoke_session(n):
+        sessions = RefreshToken.objects.bulk_create([
+            RefreshToken(user=data.user, token=f'session-{i}', expires_at='2100-01-01T00:00:00Z') for i in range(n)
+        ])
+        return [Request('DELETE', f'/api/auth/sessions/{session.id}', headers=data.auth()) for session in sessions]
+
+    read = [
+        ('GET /api/home/', get(lambda i: '/api/home/')),
+        ('GET /api/categories/', get(lambda i: '/api/categories/')),
+        ('GET /api/categories/<pk>/', get(lambda i: f'/api/categories/{pick(data.category_ids, i)}/')),
+        ('GET /api/subcategories/', get(lambda i: '/api/subcategories/')),
+        ('GET /api/subcategories/<pk>/', get(lambda i: f'/api/subcategories/{pick(data.subcategory_ids, i)}/')),
+        ('GET /api/contents/<pk>/', get(lambda i: f'/api/contents/{pick(data.content_ids, i)}/')),
+        ('GET /api/contents/<pk>/image/', get(lambda i: f'/api/contents/{pick(data.content_ids, i % 50)}/image/')),
+        ('GET /api/contents/all/', get(lambda i: '/api/contents/all/')),
+        ('GET /api/contents/all/?category=', get(lambda i: f'/api/contents/all/?category={pick(data.category_ids, i)}')),
+        ('GET /api/contents/search/', get(lambda i: '/api/contents/search/?q=' + ['bóng đá', 'giá vàng', 'công nghệ'][i % 3])),
+        ('GET /api/comments/content/<id>/', get(lambda i: f'/api/comments/content/{pick(data.content_ids, i)}/')),
+        ('GET /api/comments/<id>/', get(lambda i: f'/api/comments/{pick(data.comment_ids, i)}/')),
+        ('GET /api/async/categories/', get(lambda i: '/api/async/categories/')),
+        ('GET /api/async/categories/<pk>/', get(lambda i: f'/api/async/categories/{pick(data.category_ids, i)}/')),
+        ('GET /api/async/subcategories/', get(lambda i: '/api/async/subcategories/')),
+        ('GET /api/async/subcategories/<pk>/', get(lambda i: f'/api/async/subcategories/{pick(data.subcategory_ids, i)}/')),
+        ('GET /api/async/contents/all/', get(lambda i: '/api/async/contents/all/')),
+        ('GET /api/async/contents/<pk>/', get(lambda i: f'/api/async/contents/{pick(data.content_ids, i)}/')),
+        ('GET /api/async/comments/content/<id>/', get(lambda i: f'/api/async/comments/content/{pick(data.content_ids, i)}/')),
+        ('GET /api/async/comments/<id>/', get(lambda i: f'/api/async/comments/{pick(data.comment_ids, i)}/')),
+        ('GET /api/auth/me', lambda n: [Request('GET', '/api/auth/me', headers=data.auth()) for _ in range(n)]),
+        ('GET /api/auth/sessions', lambda n: [Request('GET', '/api/auth/sessions', headers=data.auth()) for _ in range(n)]),
+    ]
+    write = [
+        ('POST /api/categories/', send('POST', lambda i: '/api/categories/', lambda i: {'name': f'Mới {i}'})),
+        ('PUT /api/categories/<pk>/', send('PUT', lambda i: f'/api/categories/{pick(data.category_ids, i)}/',
+                                          lambda i: {'name': f'Danh mục {i}'})),
+        ('DELETE /api/categories/<pk>/', delete(Category, lambda pk: f'/api/categories/{pk}/', name='Xoá')),
+        ('POST /api/subcategories/', send('POST', lambda i: '/api/subcategories/',
+                                          lambda i: {'sub': f'Mới {i}', 'description': 'x', 'category': category_id})),
+        ('PUT /api/subcategories/<pk>/', send('PUT', lambda i: f'/api/subcategories/{pick(data.subcategory_ids, i)}/',
+                                             lambda i: {'sub': f'Chuyên mục {i}', 'description': 'x',
+                                                        'category': pick(data.category_ids, i)})),
+        ('DELETE /api/subcategories/<pk>/', delete(SubCategory, lambda pk: f'/api/subcategories/{pk}/',
+                                                   sub='Xoá', description='x', category_id=category_id)),
+        ('POST /api/contents/', send('POST', lambda i: '/api/contents/', data.content_body)),
+        ('POST /api/contents/bulk/', send('POST', lambda i: '/api/contents/bulk/',
+                                          lambda i: [data.content_body(i * 50 + k) for k in range(50)])),
+        ('PUT /api/contents/<pk>/', send('PUT', lambda i: f'/api/contents/{pick(data.content_ids, i)}/',
+                                         data.content_body)),
+        ('DELETE /api/contents/<pk>/', delete(Content, lambda pk: f'/api/contents/{pk}/',
+                                              title='Xoá', content='x', image_url='https://example.com/a.png',
+                                              subcategory_id=subcategory_id, category_id=category_id)),
+        ('POST /api/comments/content/<id>/', send('POST', lambda i: f'/api/comments/content/{pick(data.content_ids, i)}/',
+                                                  lambda i: {'title': f'Bình luận mới {i}', 'author': 'Độc giả'})),
+        ('PUT /api/comments/<id>/', send('PUT', lambda i: f'/api/comments/{pick(data.comment_ids, i)}/',
+                                         lambda i: {'title': f'Sửa {i}'})),
+        ('DELETE /api/comments/<id>/', delete(Comment, lambda pk: f'/api/comments/{pk}/',
+                                              title='Xoá', content_id=data.content_ids[0])),
+        ('POST /api/auth/register', send('POST', lambda i: '/api/auth/register',
+                                         lambda i: {'email': f'new{i}.{time.time_ns()}@example.com',
+                                                    'password': data.password}), 0.05),
+        ('POST /api/auth/login', send('POST', lambda i: '/api/auth/login',
+                                      lambda i: {'email': data.login_user.email, 'password': data.password}), 0.05),
+        ('POST /api/auth/refresh_token', send('POST', lambda i: '/api/auth/refresh_token',
+                                              lambda i: {'refresh_token': data.refresh_token})),
+        ('PATCH /api/auth/me', send('PATCH', lambda i: '/api/auth/me',
+                                    lambda i: {'first_name': 'Người', 'last_name': 'Dùng', 'username': f'user{i:06}'},
+                                    data.auth())),
+        ('PATCH /api/auth/password', send('PATCH', lambda i: '/api/auth/password',
+                                          lambda i: {'current_password': data.password, 'new_password': data.password,
+                                                     'refresh_token': data.refresh_token}, data.auth()), 0.05),
+        ('DELETE /api/auth/sessions/<pk>', revoke_session),
+    ]
+    return [(entry + (1.0,))[:3] for entry in read + write]
+
+
+def run_wsgi(requests, concurrency):
+    from django.db import connections
+    from django.test import Client
+
+    local = threading.local()
+
+    def send(request):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client(raise_request_exception=False)
+        start = time.perf_counter()
+        response = client.generic(
+            request.method, request.path, request.body or '', content_type='application/json', headers=request.headers,
+        )
+        latency = time.perf_counter() - start
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+        return latency, response.status_code, response.get('Server-Timing', '')
+
+    def close(_):
+        connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        results = list(executor.map(send, requests))
+        wall = time.perf_counter() - start
+        list(executor.map(close, range(concurrency)))
+    return results, wall
+
+
+def run_asgi(requests, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient(raise_request_exception=False)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(request):
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.generic(
+                    request.method, request.path, request.body or '', content_type='application/json',
+                    headers=request.headers,
+                )
+                latency = time.perf_counter() - start
+                return latency, response.status_code, response.get('Server-Timing', '')
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(send(request) for request in requests))
+        return results, time.perf_counter() - start
+
+    return asyncio.run(main())
+
+
+RUNNERS = {'wsgi': run_wsgi, 'asgi': run_asgi}
+
+
+def summarize(name, client, concurrency, results, wall):
+    latencies = sorted(latency for latency, _, _ in results)
+    statuses = Counter(str(status) for _, status, _ in results)
+    queries = [int(match.group(1)) for _, _, timing in results for match in [QUERIES_RE.search(timing)] if match]
+    return {
+        'scenario': name,
+        'client': client,
+        'concurrency': concurrency,
+        'requests': len(results),
+        'statuses': dict(sorted(statuses.items())),
+        'errors': sum(count for status, count in statuses.items() if status.startswith('5')),
+        'throughput_rps': round(len(results) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions of `results` against a previous run's output.
+    """
+    previous = {(row['scenario'], row['client'], row['concurrency']): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        base = previous.get((row['scenario'], row['client'], row['concurrency']))
+        if base is None:
+            continue
+        label = f"{row['scenario']} [{row['client']} x{row['concurrency']}]"
+        if row['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{label}: throughput {row['throughput_rps']} < {base['throughput_rps']} rps")
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {row['p95_ms']} > {base['p95_ms']} ms")
+        if None not in (row['queries_max'], base['queries_max']) and row['queries_max'] > base['queries_max']:
+            regressions.append(f"{label}: {row['queries_max']} queries > {base['queries_max']}")
+        if row['errors'] > base['errors']:
+            regressions.append(f"{label}: {row['errors']} server errors > {base['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=100, help='At least 2.')
+    parser.add_argument('--categories', type=int, default=10)
+    parser.add_argument('--subcategories', type=int, default=5, help='Per category.')
+    parser.add_argument('--contents', type=int, default=2000)
+    parser.add_argument('--comments', type=int, default=3, help='Per content.')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario and level.')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests sent first.')
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--clients', default='wsgi,asgi')
+    parser.add_argument('--scenarios', default='', help='Only run scenarios matching this regex.')
+    parser.add_argument('--output', help='Write the report here instead of stdout.')
+    parser.add_argument('--baseline', help='Fail on regressions against this report.')
+    parser.add_argument('--save-baseline', help='Also write the report here.')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    # Threads need a shared database, and the query counts come from the
+    # Server-Timing header of the performance middleware.
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    os.environ.setdefault('BENCHMARK_DATABASE', os.path.join(workdir, 'db.sqlite3'))
+    os.environ.setdefault('IMAGE_PROXY_CACHE_DIR', os.path.join(workdir, 'images'))
+    os.environ['PERF_METRICS_ENABLED'] = 'true'
+    setup()
+
+    # The image origin runs on loopback, which the proxy refuses outside this harness.
+    from utils import image_proxy
+    image_proxy.is_public_address = lambda ip: ip == '127.0.0.1'
+    image_origin = start_image_origin()
+    data = Dataset(args, image_origin)
+    levels = [int(level) for level in args.concurrency.split(',')]
+    clients = args.clients.split(',')
+    selected = re.compile(args.scenarios)
+
+    results = []
+    for name, builder, scale in scenarios(data):
+        if not selected.search(name):
+            continue
+        count = max(1, int(args.requests * scale))
+        for client in clients:
+            for concurrency in levels:
+                requests = builder(args.warmup + count)
+                RUNNERS[client](requests[:args.warmup], 1)
+                rows, wall = RUNNERS[client](requests[args.warmup:], concurrency)
+                results.append(summarize(name, client, concurrency, rows, wall))
+                print(f"{name:<40} {client} x{concurrency:<3} {results[-1]['throughput_rps']:>9} rps "
+                      f"p95 {results[-1]['p95_ms']:>9} ms", file=sys.stderr)
+    image_origin.shutdown()
+
+    report = json.dumps({'dataset': data.sizes, 'levels': levels, 'results': results}, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(report)
+    else:
+        print(report)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            file.write(report)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Login latency and queries under concurrent load.
+
+    python -m benchmarks.login --logins 500 --concurrency 1,8,32
+
+Password hashing dominates a real login, so by default the users get the MD5
+hasher and the numbers show the query and serialization path; pass
+--hasher default to measure with the project's hashers.
+
+To compare against another version of the login view, run the script in a
+checkout of that version with --save-baseline, then here with --baseline:
+
+    git worktree add /tmp/before <commit>
+    cp benchmarks/login.py benchmarks/utils.py /tmp/before/benchmarks/
+    (cd /tmp/before && python -m benchmarks.login --save-baseline /tmp/before.json)
+    python -m benchmarks.login --baseline /tmp/before.json
+
+Each result then also shows the baseline's numbers and the change.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import percentile, setup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--logins', type=int, default=500, help='Per concurrency level.')
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--hasher', choices=['md5', 'default'], default='md5')
+    parser.add_argument('--baseline', help='Compare with this report.')
+    parser.add_argument('--save-baseline', help='Also write the report here.')
+    args = parser.parse_args()
+
+    os.environ.setdefault('BENCHMARK_DATABASE', os.path.join(tempfile.mkdtemp(prefix='login-'), 'db.sqlite3'))
+    setup()
+
+    from django.contrib.auth.hashers import make_password
+    from django.db import connection, connections
+    from django.test import Client, override_settings
+    from home.models import User
+
+    if args.hasher == 'md5':
+        # override_settings() clears the cached hashers; assigning the setting would not.
+        override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']).enable()
+    password = make_password('benchmark-password')
+    User.objects.bulk_create([
+        User(username=f'user{i}', email=f'user{i}@example.com', password=password) for i in range(args.users)
+    ])
+    bodies = [
+        json.dumps({'email': f'user{i % args.users}@example.com', 'password': 'benchmark-password'})
+        for i in range(args.logins)
+    ]
+    local = threading.local()
+
+    def login(body):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client()
+        queries = []
+        start = time.perf_counter()
+        with connection.execute_wrapper(lambda execute, *params: queries.append(1) or execute(*params)):
+            response = client.post('/api/auth/login', body, content_type='application/json')
+        latency = time.perf_counter() - start
+        assert response.status_code == 200, response.content
+        return latency, len(queries)
+
+    for body in bodies[:args.users]:
+        login(body)
+
+    results = []
+    for concurrency in [int(level) for level in args.concurrency.split(',')]:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            start = time.perf_counter()
+            rows = list(executor.map(login, bodies))
+            wall = time.perf_counter() - start
+            list(executor.map(lambda _: connections.close_all(), range(concurrency)))
+        latencies = sorted(latency for latency, _ in rows)
+        results.append({
+            'concurrency': concurrency,
+            'logins_per_s': round(len(rows) / wall, 1),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+            'queries_per_login': max(queries for _, queries in rows),
+        })
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(results, json.load(file))
+    report = json.dumps({'hasher': args.hasher, 'results': results}, indent=2)
+    print(report)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            file.write(report)
+
+
+def compare(results, baseline):
+    """
+    Add each row's baseline numbers and the change against them.
+    """
+    previous = {row['concurrency']: row for row in baseline['results']}
+    for row in results:
+        base = previous.get(row['concurrency'])
+        if base is None:
+            continue
+        row['baseline'] = {key: base[key] for key in ('logins_per_s', 'p50_ms', 'p95_ms', 'queries_per_login')}
+        row['throughput_x'] = round(row['logins_per_s'] / base['logins_per_s'], 2)
+        row['p50_x'] = round(row['p50_ms'] / base['p50_ms'], 2)
+
+
+if __name__ == '__main__':
+    main()
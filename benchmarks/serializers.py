@@ -0,0 +1,70 @@
+"""
+Compare ModelSerializer + JSONRenderer with utils.fast_serializer.
+
+    python -m benchmarks.serializers --rows 5000
+"""
+import argparse
+
+from benchmarks.utils import setup, best_of
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+
+    from rest_framework.renderers import JSONRenderer
+    from home.models import Category, SubCategory, Content
+    from home.serializers import (
+        CategorySerializer, SubCategorySerializer, ContentSerializer,
+        category_fast_serializer, subcategory_fast_serializer, content_fast_serializer,
+    )
+    from utils.fast_serializer import render_json
+
+    categories = Category.objects.bulk_create(
+        Category(name=f'Category {i}', description='Mô tả') for i in range(args.rows)
+    )
+    SubCategory.objects.bulk_create(
+        SubCategory(sub=f'Sub {i}', description='Mô tả', category=categories[i % len(categories)])
+        for i in range(args.rows)
+    )
+    subcategory = SubCategory.objects.first()
+    Content.objects.bulk_create(
+        Content(
+            title=f'Bài viết {i}', content='Nội dung ' * 50, author='Tác giả',
+            image_url='https://example.com/a.png' if i % 2 else None,
+            image_file=None if i % 2 else f'images/{i}.jpg',
+            subcategory=subcategory, category=subcategory.category,
+        )
+        for i in range(args.rows)
+    )
+
+    cases = [
+        ('category', Category, CategorySerializer, category_fast_serializer),
+        ('subcategory', SubCategory, SubCategorySerializer, subcategory_fast_serializer),
+        ('content', Content, ContentSerializer, content_fast_serializer),
+    ]
+    renderer = JSONRenderer()
+    print(f'{"serializer":<12} {"rows":>7} {"drf ms":>9} {"fast ms":>9} {"speedup":>8}')
+    for name, model, serializer_class, fast_serializer in cases:
+        # Rows are fetched up front: this measures serialization and rendering only.
+        instances = list(model.objects.order_by('id'))
+        rows = list(fast_serializer.values(model.objects.order_by('id')))
+
+        def drf():
+            return renderer.render(serializer_class(instances, many=True).data)
+
+        def fast():
+            return render_json(fast_serializer.to_representation(rows))
+
+        assert drf() == fast(), f'{name}: fast path output differs'
+        drf_time = best_of(drf, args.repeat)
+        fast_time = best_of(fast, args.repeat)
+        print(f'{name:<12} {args.rows:>7} {drf_time * 1000:>9.1f} {fast_time * 1000:>9.1f} {drf_time / fast_time:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""
+Settings for the benchmark scripts: the project settings on a throwaway SQLite
+database and the local-memory cache, so no MySQL/Redis or .env is needed.
+"""
+import os
+
+os.environ.setdefault('DATABASE_NAME', 'benchmark')
+os.environ.setdefault('DATABASE_USER', 'benchmark')
+os.environ.setdefault('DATABASE_PASSWORD', 'benchmark')
+os.environ.setdefault('JWT_SECRET', 'benchmark-secret')
+os.environ.setdefault('JWT_ACCESS_TOKEN_EXP', '1800')
+os.environ.setdefault('JWT_REFRESH_TOKEN_EXP', '2592000')
+
+from PythonWeb.settings import *  # noqa: E402,F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DATABASE', ':memory:'),
+        # Concurrent load tests wait for SQLite's write lock instead of failing.
+        'OPTIONS': {'timeout': 30},
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Build tables straight from the models.
+MIGRATION_MODULES = {app: None for app in ['admin', 'auth', 'contenttypes', 'sessions', 'home', 'auths']}
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('categories/', async_views.category_list, name='async-category-list'),
+    path('categories/<int:pk>/', async_views.category_detail, name='async-category-detail'),
+    path('subcategories/', async_views.subcategory_list, name='async-subcategory-list'),
+    path('subcategories/<int:pk>/', async_views.subcategory_detail, name='async-subcategory-detail'),
+    path('contents/all/', async_views.content_list, name='async-content-list'),
+    path('contents/<int:pk>/', async_views.content_detail, name='async-content-detail'),
+    path('comments/content/<int:content_id>/', async_views.content_comments, name='async-content-comments'),
+    path('comments/<int:id>/', async_views.comment_detail, name='async-comment-detail'),
+]
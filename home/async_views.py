@@ -0,0 +1,104 @@
+"""
+Async versions of the read endpoints in home.views.
+
+They are coroutines that await Django's async ORM and cache API instead of
+running a sync DRF view in a thread. Responses are byte-for-byte the same
+JSON as the sync endpoints.
+
+Neither API does async I/O yet: Django runs each ORM query and each cache
+call (the BaseCache a* methods) on a worker thread via sync_to_async. Only
+those calls hold a thread, not the whole request, so under ASGI a slow
+client only holds a coroutine.
+"""
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+
+from utils.fast_serializer import fast_response
+from utils.pagination import CursorPagination
+from utils.redis import aread_through
+from PythonWeb.settings import TAXONOMY_CACHE_TIMEOUT
+from .models import Category, SubCategory, Content, Comment
+from .serializers import CategorySerializer, SubCategorySerializer, ContentSerializer, CommentSerializer
+from .serializers import category_fast_serializer, subcategory_fast_serializer, content_fast_serializer
+from .views import content_filters
+
+
+async def _values(fast_serializer, queryset):
+    return fast_serializer.to_representation([row async for row in fast_serializer.values(queryset)])
+
+
+@require_GET
+async def category_list(request):
+    async def compute():
+        return await _values(category_fast_serializer, Category.objects.all())
+    return fast_response(await aread_through('categories', ['category'], compute, TAXONOMY_CACHE_TIMEOUT))
+
+
+@require_GET
+async def category_detail(request, pk):
+    try:
+        category = await Category.objects.aget(pk=pk)
+    except Category.DoesNotExist:
+        return fast_response({'error': 'Category not found'}, status.HTTP_404_NOT_FOUND)
+    return fast_response(CategorySerializer(category).data)
+
+
+@require_GET
+async def subcategory_list(request):
+    async def compute():
+        return await _values(subcategory_fast_serializer, SubCategory.objects.all())
+    return fast_response(await aread_through('subcategories', ['subcategory'], compute, TAXONOMY_CACHE_TIMEOUT))
+
+
+@require_GET
+async def subcategory_detail(request, pk):
+    try:
+        subcategory = await SubCategory.objects.aget(pk=pk)
+    except SubCategory.DoesNotExist:
+        return fast_response({'error': 'SubCategory not found'}, status.HTTP_404_NOT_FOUND)
+    return fast_response(SubCategorySerializer(subcategory).data)
+
+
+@require_GET
+async def content_list(request):
+    try:
+        contents = Content.objects.filter(**content_filters(request.GET))
+    except ValidationError as e:
+        return fast_response(e.detail, status.HTTP_400_BAD_REQUEST)
+
+    paginator = CursorPagination()
+    try:
+        page = await paginator.apaginate_queryset(content_fast_serializer.values(contents), request)
+    except NotFound as e:
+        return fast_response({'detail': str(e.detail)}, status.HTTP_404_NOT_FOUND)
+    data = content_fast_serializer.to_representation(page)
+    return fast_response(paginator.get_paginated_response(data).data)
+
+
+@require_GET
+async def content_detail(request, pk):
+    try:
+        content = await Content.objects.aget(pk=pk)
+    except Content.DoesNotExist:
+        return fast_response({'error': 'Content not found'}, status.HTTP_404_NOT_FOUND)
+    return fast_response(ContentSerializer(content).data)
+
+
+@require_GET
+async def content_comments(request, content_id):
+    if not await Content.objects.filter(id=content_id).aexists():
+        return fast_response({'detail': 'Content not found'}, status.HTTP_404_NOT_FOUND)
+    comments = CommentSerializer.setup_eager_loading(
+        Comment.objects.filter(content_id=content_id).order_by('created_date')
+    )
+    return fast_response(CommentSerializer([comment async for comment in comments], many=True).data)
+
+
+@require_GET
+async def comment_detail(request, id):
+    try:
+        comment = await CommentSerializer.setup_eager_loading(Comment.objects.all()).aget(id=id)
+    except Comment.DoesNotExist:
+        return fast_response({'error': 'Comment not found'}, status.HTTP_404_NOT_FOUND)
+    return fast_response(CommentSerializer(comment).data)
@@ -0,0 +1,134 @@
+import datetime
+import time
+
+from django.core.cache import cache
+
+from utils.redis import cache_lock
+from PythonWeb.settings import HOME_FEED_SIZE, HOME_FEED_TIMEOUT
+from .models import Content
+
+# Feeds keep spare entries so a deletion rarely forces a rebuild.
+FEED_CAPACITY = HOME_FEED_SIZE * 2
+FEED_KINDS = ('category', 'subcategory')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def feed_key(kind, id):
+    return f'feed:{kind}:{id}'
+
+
+def sort_key(created_date):
+    return (created_date - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def memberships(active, category_id, subcategory_id):
+    """
+    The feeds a Content with these values belongs to.
+    """
+    if not active:
+        return set()
+    return {(kind, id) for kind, id in zip(FEED_KINDS, (category_id, subcategory_id)) if id is not None}
+
+
+def build_feed(kind, id):
+    """
+    A feed read from the database: the newest active Content as [sort key, id]
+    pairs, newest first. `complete` means every matching row is in `items`.
+    """
+    rows = (
+        Content.objects.filter(active=True, **{f'{kind}_id': id})
+        .order_by('-created_date', '-id').values_list('created_date', 'id')[:FEED_CAPACITY]
+    )
+    items = [[sort_key(created_date), pk] for created_date, pk in rows]
+    return {'items': items, 'complete': len(items) < FEED_CAPACITY}
+
+
+def get_feeds(feeds):
+    """
+    Content ids of each (kind, id) feed, newest first, from one multi-get.
+    Feeds missing from the cache are rebuilt and stored.
+
+    A rebuild whose SELECT ran before a write committed can be stored after that
+    write found no feed to update, so rebuilt feeds expire HOME_FEED_TIMEOUT
+    seconds later instead of missing the write for good.
+    """
+    keys = {feed_key(kind, id): (kind, id) for kind, id in feeds}
+    found = cache.get_many(list(keys))
+    missing = {key: build_feed(*feed) for key, feed in keys.items() if key not in found}
+    for feed in missing.values():
+        feed['expires'] = time.time() + HOME_FEED_TIMEOUT
+    if missing:
+        cache.set_many(missing, timeout=HOME_FEED_TIMEOUT)
+        found.update(missing)
+    return {feed: [pk for _, pk in found[key]['items'][:HOME_FEED_SIZE]] for key, feed in keys.items()}
+
+
+def _change_feed(kind, id, change):
+    key = feed_key(kind, id)
+    with cache_lock(key) as acquired:
+        if not acquired:
+            cache.delete(key)
+            return
+        feed = cache.get(key)
+        if feed is None:
+            return
+        # Changes keep the expiry the feed was rebuilt with, so writes do not extend it.
+        expires = feed.get('expires', 0)
+        feed = change(feed)
+        if feed is None or expires <= time.time():
+            cache.delete(key)
+        else:
+            feed['expires'] = expires
+            cache.set(key, feed, timeout=expires - time.time())
+
+
+def _remove(pk):
+    def change(feed):
+        items = [item for item in feed['items'] if item[1] != pk]
+        if len(items) < HOME_FEED_SIZE and not feed['complete']:
+            return None
+        return {'items': items, 'complete': feed['complete']}
+    return change
+
+
+def _upsert(pk, key):
+    def change(feed):
+        items = [item for item in feed['items'] if item[1] != pk]
+        complete = feed['complete']
+        if complete or (items and [key, pk] > items[-1]):
+            items.append([key, pk])
+            items.sort(reverse=True)
+            if len(items) > FEED_CAPACITY:
+                items = items[:FEED_CAPACITY]
+                complete = False
+        return {'items': items, 'complete': complete}
+    return change
+
+
+def update_feeds(pk, created_date, state, previous=None):
+    """
+    Move a Content into or out of its feeds after a save. `state` and
+    `previous` are its (active, category_id, subcategory_id) after and before
+    the save.
+    """
+    current = memberships(*state)
+    stale = memberships(*previous) - current if previous else set()
+    for kind, id in stale:
+        _change_feed(kind, id, _remove(pk))
+    for kind, id in current:
+        _change_feed(kind, id, _upsert(pk, sort_key(created_date)))
+
+
+def remove_from_feeds(pk, state):
+    for kind, id in memberships(*state):
+        _change_feed(kind, id, _remove(pk))
+
+
+def invalidate_feeds(contents):
+    """
+    Drop the feeds touched by `contents`, for writes that send no signals.
+    """
+    keys = set()
+    for content in contents:
+        keys.update(feed_key(kind, id) for kind, id in memberships(True, content.category_id, content.subcategory_id))
+    cache.delete_many(list(keys))
@@ -0,0 +1,54 @@
+import logging
+
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from utils.images import delete_variants, executor, generate_variants, variant_files
+from .models import Content
+
+logger = logging.getLogger(__name__)
+
+
+def needs_variants(content):
+    return (content.image_file.name or None) != content.image_variants.get('source')
+
+
+def process_content_image(pk):
+    """
+    Generate the variants of one Content's image_file and store them on the row.
+    The row is only updated if the image has not been replaced meanwhile.
+    """
+    content = Content.objects.only('image_file', 'image_variants').get(pk=pk)
+    if not needs_variants(content):
+        return content.image_variants
+
+    storage = content.image_file.storage
+    name = content.image_file.name
+    if name:
+        variants = generate_variants(storage, name)
+        unchanged = Q(image_file=name)
+    else:
+        variants = {}
+        unchanged = Q(image_file='') | Q(image_file__isnull=True)
+    if Content.objects.filter(unchanged, pk=pk).update(image_variants=variants):
+        delete_variants(storage, variant_files(content.image_variants) - variant_files(variants))
+    return variants
+
+
+def _process_in_worker(pk):
+    close_old_connections()
+    try:
+        process_content_image(pk)
+    except Exception:
+        logger.exception('Failed to generate image variants for content %s', pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_variants(content):
+    """
+    Queue variant generation on the worker pool once the current transaction
+    commits, so the upload request does not wait for the resizing.
+    """
+    if needs_variants(content):
+        transaction.on_commit(lambda: executor.submit(_process_in_worker, content.pk))
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from home.images import needs_variants, process_content_image
+from home.models import Content
+from PythonWeb.settings import IMAGE_VARIANT_WORKERS
+
+
+def _process(pk):
+    close_old_connections()
+    try:
+        process_content_image(pk)
+        return pk, None
+    except Exception as e:
+        return pk, e
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = 'Generate missing or stale image variants for existing Content in primary key batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=IMAGE_VARIANT_WORKERS)
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be processed without writing.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = processed = failed = 0
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                batch = list(
+                    Content.objects.filter(pk__gt=last_id).exclude(image_file='').exclude(image_file__isnull=True)
+                    .order_by('pk').only('pk', 'image_file', 'image_variants')[:batch_size]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].pk
+                checked += len(batch)
+
+                pending = [content.pk for content in batch if needs_variants(content)]
+                if options['dry_run']:
+                    processed += len(pending)
+                    continue
+                for pk, error in executor.map(_process, pending):
+                    if error is None:
+                        processed += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(f'Content {pk}: {error}')
+
+        action = 'would process' if options['dry_run'] else 'processed'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} images, {action} {processed}, {failed} failed.'))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from home.models import Content, Comment
+
+
+class Command(BaseCommand):
+    help = 'Recompute Content.comment_count from home_comment in primary key batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches.')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = fixed = 0
+
+        while True:
+            batch = list(
+                Content.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', 'comment_count')[:batch_size]
+            )
+            if not batch:
+                break
+            last_id = batch[-1][0]
+
+            actual = dict(
+                Comment.objects.filter(content_id__gte=batch[0][0], content_id__lte=last_id)
+                .order_by().values_list('content_id').annotate(count=Count('id'))
+            )
+            drifted = [pk for pk, stored in batch if stored != actual.get(pk, 0)]
+
+            if drifted and not options['dry_run']:
+                # Recount inside the UPDATE so comments added meanwhile are not lost.
+                Content.objects.filter(pk__in=drifted).update(comment_count=Coalesce(Subquery(
+                    Comment.objects.filter(content_id=OuterRef('pk')).order_by()
+                    .values('content_id').annotate(count=Count('id')).values('count')
+                ), 0))
+
+            checked += len(batch)
+            fixed += len(drifted)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        action = 'would fix' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} contents, {action} {fixed}.'))
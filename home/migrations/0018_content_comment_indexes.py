@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0017_alter_content_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['created_date', 'id'], name='content_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['active', 'created_date', 'id'], name='content_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['category', 'created_date', 'id'], name='content_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['subcategory', 'created_date', 'id'], name='content_sub_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['content', 'created_date'], name='comment_content_created_idx'),
+        ),
+    ]
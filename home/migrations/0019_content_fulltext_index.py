@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-18 10:05
+
+from django.db import migrations
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        'CREATE FULLTEXT INDEX content_title_content_ft ON home_content (title, content)'
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('DROP INDEX content_title_content_ft ON home_content')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0018_content_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0019_content_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0020_content_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:10
+
+import hashlib
+
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 1000
+
+
+def backfill_token_hash(apps, schema_editor):
+    RefreshToken = apps.get_model('home', 'RefreshToken')
+    db_alias = schema_editor.connection.alias
+    last_pk = None
+    while True:
+        batch = RefreshToken._base_manager.using(db_alias).order_by('pk').only('pk', 'token')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            break
+        for row in batch:
+            row.token_hash = hashlib.sha256(row.token.encode()).hexdigest()
+        with transaction.atomic(using=db_alias):
+            RefreshToken._base_manager.using(db_alias).bulk_update(batch, ['token_hash'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own so a large table isn't rewritten in one transaction.
+    atomic = False
+
+    dependencies = [
+        ('home', '0021_content_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='refreshtoken',
+            name='token_hash',
+            field=models.CharField(default='', max_length=64),
+        ),
+        migrations.RunPython(backfill_token_hash, migrations.RunPython.noop),
+        # Indexed after the backfill so the index is built once instead of updated per row.
+        migrations.AlterField(
+            model_name='refreshtoken',
+            name='token_hash',
+            field=models.CharField(db_index=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def last_used_from_updated(apps, schema_editor):
+    RefreshToken = apps.get_model('home', 'RefreshToken')
+    RefreshToken._base_manager.using(schema_editor.connection.alias).update(last_used_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0022_refreshtoken_token_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='refreshtoken',
+            name='device_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='refreshtoken',
+            name='user_agent',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='refreshtoken',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='refreshtoken',
+            name='access_token_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='refreshtoken',
+            name='last_used_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(last_used_from_updated, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='refreshtoken',
+            index=models.Index(fields=['user', 'is_deleted', 'last_used_at'], name='refreshtoken_user_used_idx'),
+        ),
+    ]
@@ -2,8 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 import uuid
-import datetime
 from django.core.exceptions import ValidationError
+from utils.jwt import hash_token
 
 class User( AbstractUser):
     # id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  
@@ -47,22 +47,47 @@ class SubCategory(models.Model):
     def __str__(self):
         return f"{self.sub} ({self.category.name if self.category else 'No Category'})"
 
+# The Content fields that decide which home feeds it is in.
+FEED_FIELDS = ('active', 'category_id', 'subcategory_id')
+
 class Content(models.Model):
     # id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255, null=False)
     image_url = models.URLField(max_length=200, blank=True, null=True)  
     image_file = models.ImageField(upload_to='images/', blank=True, null=True)  
+    image_variants = models.JSONField(default=dict, blank=True)
     content = models.TextField()
     author = models.TextField(null=True, blank=True)
     created_date = models.DateTimeField(auto_now_add=True)  
     updated_date = models.DateTimeField(auto_now=True)
     active = models.BooleanField(default=True)
+    comment_count = models.PositiveIntegerField(default=0)
     subcategory = models.ForeignKey('SubCategory', on_delete=models.CASCADE)
     category = models.ForeignKey('Category', on_delete=models.SET_NULL, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_date', 'id'], name='content_created_idx'),
+            models.Index(fields=['active', 'created_date', 'id'], name='content_active_created_idx'),
+            models.Index(fields=['category', 'created_date', 'id'], name='content_category_created_idx'),
+            models.Index(fields=['subcategory', 'created_date', 'id'], name='content_sub_created_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember which feeds the row was in, so saving it does not have to read it again.
+        loaded = dict(zip(field_names, values))
+        if all(loaded.get(name, models.DEFERRED) is not models.DEFERRED for name in FEED_FIELDS):
+            instance.saved_feed_state = tuple(loaded[name] for name in FEED_FIELDS)
+        return instance
+
+    def feed_state(self):
+        return tuple(getattr(self, name) for name in FEED_FIELDS)
+
     def clean(self):
       
         if self.image_url and self.image_file:
@@ -77,10 +102,27 @@ class Comment(models.Model):
     created_date = models.DateTimeField(auto_now_add=True)  
     content = models.ForeignKey(Content, related_name='comments', on_delete=models.CASCADE)  
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['content', 'created_date'], name='comment_content_created_idx'),
+        ]
+
     def __str__(self):
         return self.content[:50]  
 
-class SoftDeletedManager(models.Manager):
+class SoftDeleteQuerySet(models.QuerySet):
+    """
+    Bulk soft delete and restore, each a single UPDATE of is_deleted and deleted_at.
+    """
+
+    def soft_delete(self):
+        return self.update(is_deleted=True, deleted_at=timezone.now())
+
+    def restore(self):
+        return self.update(is_deleted=False, deleted_at=None)
+
+
+class SoftDeletedManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(is_deleted=False)
     
@@ -89,7 +131,7 @@ class SoftDeleteMixin(models.Model):
     deleted_at = models.DateTimeField(blank=True, null=True)
 
     objects = SoftDeletedManager()  
-    all_objects = models.Manager() 
+    all_objects = SoftDeleteQuerySet.as_manager()
 
     class Meta:
         abstract = True
@@ -97,26 +139,43 @@ class SoftDeleteMixin(models.Model):
     def delete(self, using=None, keep_parents=False, soft=True):
         if soft:
             self.is_deleted = True
-            self.deleted_at = datetime.datetime.now()
-            self.save()
+            self.deleted_at = timezone.now()
+            self.save(using=using, update_fields=['is_deleted', 'deleted_at'])
         else:
             super().delete(using=using, keep_parents=keep_parents)
 
     def restore(self):
         self.is_deleted = False
         self.deleted_at = None
-        self.save()
+        self.save(update_fields=['is_deleted', 'deleted_at'])
 
 class RefreshToken(SoftDeleteMixin):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  
     user = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name="refresh_token")
     token = models.TextField()
+    token_hash = models.CharField(max_length=64, db_index=True, default='')
+    device_name = models.CharField(max_length=255, blank=True, default='')
+    user_agent = models.CharField(max_length=255, blank=True, default='')
+    ip_address = models.GenericIPAddressField(blank=True, null=True)
+    # Whitelist key of the latest access token issued for this session.
+    access_token_key = models.CharField(max_length=64, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
     expires_at = models.DateTimeField()
 
     class Meta:
         db_table = 'refreshtoken'
+        indexes = [
+            models.Index(fields=['user', 'is_deleted', 'last_used_at'], name='refreshtoken_user_used_idx'),
+        ]
 
     def __str__(self):
-        return f"RefreshToken for {self.user.username}"
\ No newline at end of file
+        return f"RefreshToken for {self.user.username}"
+
+    def save(self, *args, **kwargs):
+        self.token_hash = hash_token(self.token)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'token' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'token_hash'}
+        super().save(*args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,175 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import Count, F, FloatField, Func
+
+from utils.pagination import CursorPagination
+from utils.redis import get_versions
+from PythonWeb.settings import SEARCH_INDEX_TTL
+from .models import Content
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class MatchAgainst(Func):
+    """
+    MySQL `MATCH (...) AGAINST (... IN NATURAL LANGUAGE MODE)` relevance score.
+    """
+    output_field = FloatField()
+
+    def __init__(self, query, *columns):
+        super().__init__(*[F(column) for column in columns])
+        self.query = query
+
+    def as_sql(self, compiler, connection, **extra_context):
+        columns = []
+        params = []
+        for expression in self.get_source_expressions():
+            sql, column_params = compiler.compile(expression)
+            columns.append(sql)
+            params.extend(column_params)
+        sql = f"MATCH ({', '.join(columns)}) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+        return sql, (*params, self.query)
+
+
+class SearchPagination(CursorPagination):
+    ordering = ('-score', '-id')
+    annotation_types = {'score': float}
+
+
+def facet_counts(queryset):
+    queryset = queryset.order_by()
+    return {
+        'categories': [
+            {'id': row['category_id'], 'count': row['count']}
+            for row in queryset.values('category_id').annotate(count=Count('id')).order_by('-count', 'category_id')
+        ],
+        'subcategories': [
+            {'id': row['subcategory_id'], 'count': row['count']}
+            for row in queryset.values('subcategory_id').annotate(count=Count('id')).order_by('-count', 'subcategory_id')
+        ],
+    }
+
+
+class InvertedIndex:
+    """
+    In-process BM25 index over Content title and body, used where the database
+    has no FULLTEXT support (SQLite in tests and benchmarks). Titles count twice.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        self.lengths = {}
+        self.documents = {}
+        for id, title, body, category_id, subcategory_id, active in rows:
+            terms = Counter(tokenize(title) * 2 + tokenize(body))
+            for term, frequency in terms.items():
+                self.postings[term][id] = frequency
+            self.lengths[id] = sum(terms.values())
+            self.documents[id] = {'category_id': category_id, 'subcategory_id': subcategory_id, 'active': active}
+        self.average_length = (sum(self.lengths.values()) / len(self.lengths)) if self.lengths else 0
+
+    def search(self, query):
+        total = len(self.documents)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for id, frequency in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[id] / self.average_length)
+                scores[id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(((score, id) for id, score in scores.items()), reverse=True)
+
+
+_index = None
+_index_version = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+
+def get_inverted_index():
+    """
+    The process's index. Every Content write bumps the content version, so a
+    changed version only triggers a rebuild once the index is SEARCH_INDEX_TTL
+    seconds old; results may lag writes by that long.
+    """
+    global _index, _index_version, _index_built_at
+    version = get_versions(['content'])[0]
+    with _index_lock:
+        stale = _index_version != version and time.monotonic() - _index_built_at >= SEARCH_INDEX_TTL
+        if _index is None or stale:
+            rows = Content.objects.values_list('id', 'title', 'content', 'category_id', 'subcategory_id', 'active')
+            _index = InvertedIndex(rows.iterator())
+            _index_version = version
+            _index_built_at = time.monotonic()
+        return _index
+
+
+def reset_index():
+    """
+    Drop the process's index so the next search rebuilds it, for tests that
+    replace the Content table under it.
+    """
+    global _index, _index_version, _index_built_at
+    with _index_lock:
+        _index, _index_version, _index_built_at = None, None, 0.0
+
+
+def _matches(document, filters):
+    return all(document[key] == value for key, value in filters.items())
+
+
+def _facets_from_index(index, ranked):
+    categories = Counter(index.documents[id]['category_id'] for _, id in ranked)
+    subcategories = Counter(index.documents[id]['subcategory_id'] for _, id in ranked)
+    return {
+        'categories': [
+            {'id': key, 'count': count}
+            for key, count in sorted(categories.items(), key=lambda item: (-item[1], item[0] or 0))
+        ],
+        'subcategories': [
+            {'id': key, 'count': count}
+            for key, count in sorted(subcategories.items(), key=lambda item: (-item[1], item[0]))
+        ],
+    }
+
+
+def search_inverted_index(query, filters, paginator, request, with_facets):
+    index = get_inverted_index()
+    ranked = [(score, id) for score, id in index.search(query) if _matches(index.documents[id], filters)]
+    facets = _facets_from_index(index, ranked) if with_facets else None
+
+    page = paginator.paginate_sorted(ranked, request, key=lambda item: item, model=Content)
+    contents = Content.objects.in_bulk([id for _, id in page])
+    return [(contents[id], score) for score, id in page if id in contents], facets
+
+
+def search_fulltext(query, filters, paginator, request, with_facets):
+    matches = Content.objects.alias(score=MatchAgainst(query, 'title', 'content')).filter(score__gt=0, **filters)
+    facets = facet_counts(matches) if with_facets else None
+
+    queryset = Content.objects.annotate(score=MatchAgainst(query, 'title', 'content')).filter(score__gt=0, **filters)
+    page = paginator.paginate_queryset(queryset, request)
+    return [(content, content.score) for content in page], facets
+
+
+def search_contents(query, filters, paginator, request, with_facets=True):
+    """
+    Rank the Content matching `filters` by relevance to `query`, best first.
+    Uses the MySQL FULLTEXT index when available, the in-process index otherwise.
+    """
+    if connection.vendor == 'mysql':
+        return search_fulltext(query, filters, paginator, request, with_facets)
+    return search_inverted_index(query, filters, paginator, request, with_facets)
@@ -1,5 +1,8 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 from .models import Category, SubCategory, Content, Comment, User
+from utils.fast_serializer import FastSerializer
+from utils.related import BatchedListSerializer, BatchedPrimaryKeyRelatedField
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -7,20 +10,36 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__' 
 
 class SubCategorySerializer(serializers.ModelSerializer):
-    category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())  
+    category = BatchedPrimaryKeyRelatedField(queryset=Category.objects.all())  
     class Meta:
         model = SubCategory
         fields = ['sub', 'description', 'category']
 
 
+class ImageVariantsField(serializers.Field):
+    """
+    Read-only {format: {width: url}} map of the resized copies of image_file.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return {
+            format: {width: default_storage.url(name) for width, name in names.items()}
+            for format, names in value.items() if format != 'source'
+        }
+
+
 class ContentSerializer(serializers.ModelSerializer):
-    subcategory_id = serializers.PrimaryKeyRelatedField(
+    subcategory_id = BatchedPrimaryKeyRelatedField(
         queryset=SubCategory.objects.all(),
         source='subcategory',
         write_only=True
     )
     
-    category_id = serializers.PrimaryKeyRelatedField(
+    category_id = BatchedPrimaryKeyRelatedField(
         queryset=Category.objects.all(),
         source='category', 
         write_only=True
@@ -28,6 +47,7 @@ class ContentSerializer(serializers.ModelSerializer):
 
     image_url = serializers.URLField(required=False, allow_null=True)
     image_file = serializers.ImageField(required=False, allow_null=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Content
@@ -36,14 +56,25 @@ class ContentSerializer(serializers.ModelSerializer):
             'title',
             'image_url',  
             'image_file',
+            'image_variants',
             'content',
             'author',
             'created_date',
             'updated_date',
             'active',
+            'comment_count',
             'subcategory_id',
             'category_id',
         ]
+        read_only_fields = ['comment_count']
+        list_serializer_class = BatchedListSerializer
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.only(
+            'id', 'title', 'image_url', 'image_file', 'image_variants', 'content', 'author',
+            'created_date', 'updated_date', 'active', 'comment_count',
+        )
 
     def validate(self, data):
         image_url = data.get('image_url')
@@ -57,14 +88,30 @@ class ContentSerializer(serializers.ModelSerializer):
 
         return data
     
+class CommentContentSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True, default=None)
+
+    class Meta:
+        model = Content
+        fields = ['id', 'title', 'category_id', 'category_name']
+
+
 class CommentSerializer(serializers.ModelSerializer):
-    
+    content = CommentContentSerializer(read_only=True)
+
     class Meta:
         model = Comment
-        fields = ['id', 'title', 'author', 'created_date']
+        fields = ['id', 'title', 'author', 'created_date', 'content']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('content__category').only(
+            'id', 'title', 'author', 'created_date',
+            'content', 'content__title', 'content__category', 'content__category__name',
+        )
     
     def validate(self, data):
-        if self.instance is None and not data.get('content'):
+        if self.instance is None and not self.initial_data.get('content'):
             raise serializers.ValidationError("Cần chọn một content hợp lệ cho comment.")
         return data
 
@@ -73,3 +120,7 @@ class UserSerializers(serializers.ModelSerializer):
         model = User
         fields = '__all__'
 
+
+category_fast_serializer = FastSerializer(CategorySerializer)
+subcategory_fast_serializer = FastSerializer(SubCategorySerializer)
+content_fast_serializer = FastSerializer(ContentSerializer)
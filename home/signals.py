@@ -0,0 +1,56 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from utils.redis import bump_version
+from .feeds import remove_from_feeds, update_feeds
+from .images import schedule_image_variants
+from .models import Category, SubCategory, Content, FEED_FIELDS
+
+
+@receiver([post_save, post_delete], sender=Category)
+def bump_category_version(sender, **kwargs):
+    bump_version('category')
+
+
+@receiver([post_save, post_delete], sender=SubCategory)
+def bump_subcategory_version(sender, **kwargs):
+    bump_version('subcategory')
+
+
+@receiver([post_save, post_delete], sender=Content)
+def bump_content_version(sender, **kwargs):
+    bump_version('content')
+
+
+@receiver(post_save, sender=Content)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_image_variants(instance)
+
+
+@receiver(pre_save, sender=Content)
+def remember_feed_membership(sender, instance, raw=False, **kwargs):
+    # Only for instances that were not loaded from the database but update a row.
+    if not raw and instance.pk is not None and not hasattr(instance, 'saved_feed_state'):
+        instance.saved_feed_state = (
+            Content.objects.filter(pk=instance.pk).values_list(*FEED_FIELDS).first()
+        )
+
+
+# Feeds change once the transaction commits, so a rollback leaves them alone and
+# no reader rebuilds a feed from rows that are not committed yet.
+
+@receiver(post_save, sender=Content)
+def update_content_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        state, previous = instance.feed_state(), getattr(instance, 'saved_feed_state', None)
+        instance.saved_feed_state = state
+        transaction.on_commit(partial(update_feeds, instance.pk, instance.created_date, state, previous))
+
+
+@receiver(post_delete, sender=Content)
+def remove_content_from_feeds(sender, instance, **kwargs):
+    transaction.on_commit(partial(remove_from_feeds, instance.pk, instance.feed_state()))
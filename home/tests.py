@@ -1,7 +1,1021 @@
-from django.test import TestCase, SimpleTestCase
+import asyncio
+import hashlib
+import http.server
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast, Length
+from django.test import Client, TestCase, SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from utils import image_proxy, metrics
+from utils.redis import cache_lock, get_or_compute, aget_or_compute
+from PythonWeb.settings import HOME_FEED_SIZE, HOME_FEED_TIMEOUT
+from utils.fast_serializer import render_json
+from utils.pagination import encode_cursor
+from . import feeds, search, views
+from .images import process_content_image
+from .search import SearchPagination
+from .models import Category, SubCategory, Content, Comment, RefreshToken, User
+from .serializers import CategorySerializer, SubCategorySerializer, ContentSerializer
+from .serializers import category_fast_serializer, subcategory_fast_serializer, content_fast_serializer
 
 # Create your tests here.
 class SimpleTest(SimpleTestCase):
     def test_home_page_status(self):
         response = self.client.get('/')
-        self.assertEqual.S(response.status_code,200)
\ No newline at end of file
+        self.assertEqual.S(response.status_code,200)
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN on every query issued by the read endpoints in home.views and
+    fails on full table scans or filesorts. The category/subcategory listings
+    return whole tables by design and are not checked.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='News')
+        cls.subcategory = SubCategory.objects.create(sub='World', description='World news', category=cls.category)
+        cls.content = Content.objects.create(
+            title='Title', content='Body', image_url='https://example.com/a.png',
+            subcategory=cls.subcategory, category=cls.category,
+        )
+        cls.comment = Comment.objects.create(title='Nice', author='reader', content=cls.content)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def plan_problems(self, sql):
+        problems = []
+        for row in self.explain(sql):
+            if connection.vendor == 'mysql':
+                if row.get('type') == 'ALL':
+                    problems.append(f"full scan on {row.get('table')}")
+                if 'Using filesort' in (row.get('Extra') or ''):
+                    problems.append(f"filesort on {row.get('table')}")
+            elif connection.vendor == 'sqlite':
+                detail = row.get('detail', '')
+                if detail.startswith('SCAN ') and 'INDEX' not in detail:
+                    problems.append(detail)
+                if 'USE TEMP B-TREE' in detail:
+                    problems.append(detail)
+        return problems
+
+    def assertIndexedQueries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        selects = [query['sql'] for query in captured.captured_queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects, url)
+        for sql in selects:
+            self.assertEqual(self.plan_problems(sql), [], f'{url}: {sql}')
+        return response
+
+    def test_content_feed(self):
+        base = '/api/contents/all/'
+        response = self.assertIndexedQueries(f'{base}?page_size=1')
+        self.assertIndexedQueries(f'{base}?active=true')
+        self.assertIndexedQueries(f'{base}?category={self.category.id}')
+        self.assertIndexedQueries(f'{base}?subcategory={self.subcategory.id}&active=true')
+        Content.objects.create(
+            title='Older', content='Body', image_url='https://example.com/b.png',
+            subcategory=self.subcategory, category=self.category,
+        )
+        cursor = self.client.get(f'{base}?page_size=1').json()['pagination']['next_cursor']
+        self.assertIndexedQueries(f'{base}?page_size=1&cursor={cursor}')
+        self.assertIndexedQueries(f'{base}?page_size=1&active=true&cursor={cursor}')
+        self.assertEqual(response.json()['success'], True)
+
+    def test_detail_endpoints(self):
+        self.assertIndexedQueries(f'/api/categories/{self.category.id}/')
+        self.assertIndexedQueries(f'/api/subcategories/{self.subcategory.id}/')
+        self.assertIndexedQueries(f'/api/contents/{self.content.id}/')
+        self.assertIndexedQueries(f'/api/comments/{self.comment.id}/')
+
+    def test_comments_by_content(self):
+        self.assertIndexedQueries(f'/api/comments/content/{self.content.id}/')
+
+
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='News')
+        subcategory = SubCategory.objects.create(sub='World', description='World news', category=category)
+        Content.objects.bulk_create([
+            Content(title=f'Title {i}', content='Body', image_url='https://example.com/a.png',
+                    subcategory=subcategory, category=category)
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        search.reset_index()
+
+    def test_round_trip(self):
+        first = self.client.get('/api/contents/all/', {'page_size': 2}).json()
+        second = self.client.get(
+            '/api/contents/all/', {'page_size': 2, 'cursor': first['pagination']['next_cursor']}
+        ).json()
+        ids = [item['id'] for item in first['data'] + second['data']]
+        expected = list(Content.objects.order_by('-created_date', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertIsNone(second['pagination']['next_cursor'])
+
+    def test_tampered_cursor(self):
+        for cursor in ['!!!', encode_cursor(['not a date', 'x']), encode_cursor([[1], 2]), encode_cursor({'id': 1})]:
+            for path in ['/api/contents/all/', '/api/async/contents/all/']:
+                response = self.client.get(path, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404, (path, cursor))
+        for q in ['Title', 'zzz']:
+            response = self.client.get('/api/contents/search/', {'q': q, 'cursor': encode_cursor(['x', 'y'])})
+            self.assertEqual(response.status_code, 404, q)
+
+    def test_annotated_ordering(self):
+        # The MySQL search path: keyset pagination on an annotation that is not a model field.
+        queryset = Content.objects.annotate(score=Cast(Length('title'), FloatField()) + F('id'))
+        factory = APIRequestFactory()
+        paginator = SearchPagination()
+        first = paginator.paginate_queryset(queryset, Request(factory.get('/', {'page_size': 2})))
+        cursor = paginator.next_cursor
+        second = paginator.paginate_queryset(queryset, Request(factory.get('/', {'page_size': 2, 'cursor': cursor})))
+        expected = sorted(queryset, key=lambda content: (content.score, content.id), reverse=True)
+        self.assertEqual(first + second, expected)
+        with self.assertRaises(NotFound):
+            paginator.paginate_queryset(queryset, Request(factory.get('/', {'cursor': encode_cursor(['x', 1])})))
+
+
+class TaxonomyCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Thời sự')
+        cls.subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=cls.category)
+
+    def setUp(self):
+        cache.clear()
+
+    def names(self, path, field):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [item[field] for item in response.json()]
+
+    def test_writes_show_up_on_next_read(self):
+        for path in ['/api/categories/', '/api/async/categories/']:
+            self.assertEqual(self.names(path, 'name'), ['Thời sự'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('/api/categories/', 'name'), ['Thời sự'])
+
+        response = self.client.put(
+            f'/api/categories/{self.category.pk}/', {'name': 'Tin tức'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        for path in ['/api/categories/', '/api/async/categories/']:
+            self.assertEqual(self.names(path, 'name'), ['Tin tức'], path)
+
+        self.assertEqual(self.names('/api/subcategories/', 'sub'), ['Thế giới'])
+        response = self.client.put(
+            f'/api/subcategories/{self.subcategory.pk}/',
+            {'sub': 'Quốc tế', 'description': 'Tin quốc tế', 'category': self.category.pk},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        for path in ['/api/subcategories/', '/api/async/subcategories/']:
+            self.assertEqual(self.names(path, 'sub'), ['Quốc tế'], path)
+
+        self.assertEqual(self.client.delete(f'/api/subcategories/{self.subcategory.pk}/').status_code, 204)
+        self.assertEqual(self.names('/api/subcategories/', 'sub'), [])
+
+
+class QueryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='News')
+        cls.subcategory = SubCategory.objects.create(sub='World', description='World news', category=cls.category)
+        cls.content = Content.objects.create(
+            title='Title', content='Body', image_url='https://example.com/a.png',
+            subcategory=cls.subcategory, category=cls.category,
+        )
+
+    def assertConstantQueries(self, url, add_rows, sizes=(1, 5, 20)):
+        """
+        Grow the data set to each of `sizes` rows with `add_rows(n)` and check
+        that `url` runs the same number of queries every time.
+        """
+        counts = []
+        total = 0
+        for size in sizes:
+            add_rows(size - total)
+            total = size
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            counts.append(len(captured.captured_queries))
+        self.assertEqual(len(set(counts)), 1, f'{url} ran {counts} queries for {list(sizes)} rows')
+        return counts[0]
+
+    def add_comments(self, count):
+        for index in range(count):
+            Comment.objects.create(title=f'Comment {index}', author='reader', content=self.content)
+
+    def add_contents(self, count):
+        for index in range(count):
+            Content.objects.create(
+                title=f'Title {index}', content='Body', image_url='https://example.com/a.png',
+                subcategory=self.subcategory, category=self.category,
+            )
+
+    def test_comment_list(self):
+        queries = self.assertConstantQueries(f'/api/comments/content/{self.content.id}/', self.add_comments)
+        self.assertEqual(queries, 2)
+        comment = self.client.get(f'/api/comments/content/{self.content.id}/').json()[0]
+        self.assertEqual(comment['content'], {
+            'id': self.content.id, 'title': 'Title',
+            'category_id': self.category.id, 'category_name': 'News',
+        })
+
+    def test_content_list(self):
+        queries = self.assertConstantQueries('/api/contents/all/?page_size=50', self.add_contents)
+        self.assertEqual(queries, 1)
+
+    def test_content_validation_is_batched(self):
+        item = {
+            'title': 'Title', 'content': 'Body', 'image_url': 'https://example.com/a.png',
+            'subcategory_id': self.subcategory.id, 'category_id': self.category.id,
+        }
+        for size in (1, 25):
+            with self.assertNumQueries(2):
+                serializer = ContentSerializer(data=[item] * size, many=True)
+                self.assertTrue(serializer.is_valid(), serializer.errors)
+
+
+class FastSerializerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Thời sự', description=None)
+        subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=category)
+        Content.objects.create(
+            title='Bài viết', content='Nội dung', image_url='https://example.com/a.png',
+            subcategory=subcategory, category=category,
+        )
+        Content.objects.create(
+            title='Ảnh', content='Nội dung', image_file='images/a.jpg', author='Tác giả',
+            active=False, subcategory=subcategory, category=None,
+        )
+
+    def test_output_matches_model_serializers(self):
+        renderer = JSONRenderer()
+        cases = [
+            (Category, CategorySerializer, category_fast_serializer),
+            (SubCategory, SubCategorySerializer, subcategory_fast_serializer),
+            (Content, ContentSerializer, content_fast_serializer),
+        ]
+        for model, serializer_class, fast_serializer in cases:
+            queryset = model.objects.order_by('id')
+            expected = renderer.render(serializer_class(queryset, many=True).data)
+            self.assertEqual(render_json(fast_serializer.serialize(queryset)), expected, model.__name__)
+
+    def test_views_render_the_same_on_both_paths(self):
+        for path in ['/api/categories/', '/api/subcategories/', '/api/contents/all/', '/api/home/']:
+            responses = []
+            for fast in (False, True):
+                cache.clear()
+                with self.settings(FAST_JSON_RENDERING=fast):
+                    responses.append(self.client.get(path))
+            drf, fast = responses
+            self.assertTrue(hasattr(drf, 'data'), path)
+            self.assertFalse(hasattr(fast, 'data'), path)
+            self.assertEqual((fast.status_code, fast.content), (drf.status_code, drf.content), path)
+
+
+class ContentSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = Category.objects.create(name='Thể thao')
+        cls.economy = Category.objects.create(name='Kinh tế')
+        subcategory = SubCategory.objects.create(sub='Bóng đá', description='Bóng đá', category=cls.sport)
+        for title, body, category in [
+            ('Bóng đá Việt Nam', 'Trận đấu bóng đá hay nhất năm', cls.sport),
+            ('Giá vàng', 'Thị trường bóng đá và kinh tế', cls.economy),
+            ('Thời tiết', 'Trời mưa', cls.sport),
+        ]:
+            Content.objects.create(
+                title=title, content=body, image_url='https://example.com/a.png',
+                subcategory=subcategory, category=category,
+            )
+
+    def setUp(self):
+        cache.clear()
+        search.reset_index()
+        patcher = mock.patch.object(search, 'SEARCH_INDEX_TTL', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ranking_facets_and_cursor(self):
+        first = self.client.get('/api/contents/search/', {'q': 'bóng đá', 'page_size': 1}).json()
+        self.assertEqual([item['title'] for item in first['data']], ['Bóng đá Việt Nam'])
+        self.assertEqual(first['facets']['categories'], [
+            {'id': self.sport.id, 'count': 1}, {'id': self.economy.id, 'count': 1},
+        ])
+
+        cursor = first['pagination']['next_cursor']
+        second = self.client.get('/api/contents/search/', {'q': 'bóng đá', 'page_size': 1, 'cursor': cursor}).json()
+        self.assertEqual([item['title'] for item in second['data']], ['Giá vàng'])
+        self.assertIsNone(second['pagination']['next_cursor'])
+
+    def test_filters_and_new_content(self):
+        response = self.client.get('/api/contents/search/', {'q': 'bóng', 'category': self.economy.id}).json()
+        self.assertEqual([item['title'] for item in response['data']], ['Giá vàng'])
+
+        Content.objects.create(
+            title='Bóng chuyền', content='Giải đấu', image_url='https://example.com/a.png',
+            subcategory=SubCategory.objects.get(), category=self.sport,
+        )
+        response = self.client.get('/api/contents/search/', {'q': 'bóng chuyền'}).json()
+        self.assertEqual(response['data'][0]['title'], 'Bóng chuyền')
+
+    def test_index_rebuilt_at_most_once_per_ttl(self):
+        def titles():
+            data = self.client.get('/api/contents/search/', {'q': 'chuyền'}).json()['data']
+            return [item['title'] for item in data]
+
+        with mock.patch.object(search, 'SEARCH_INDEX_TTL', 60):
+            self.assertEqual(titles(), [])
+            Content.objects.create(
+                title='Bóng chuyền', content='Giải đấu', image_url='https://example.com/a.png',
+                subcategory=SubCategory.objects.get(), category=self.sport,
+            )
+            self.assertEqual(titles(), [])
+            with mock.patch('time.monotonic', return_value=time.monotonic() + 61):
+                self.assertEqual(titles(), ['Bóng chuyền'])
+
+    def test_query_required(self):
+        self.assertEqual(self.client.get('/api/contents/search/').status_code, 400)
+
+    def test_invalid_filters(self):
+        for path, params in [
+            ('/api/contents/all/', {'category': 'abc'}),
+            ('/api/async/contents/all/', {'subcategory': 'abc'}),
+            ('/api/contents/search/', {'q': 'bóng', 'category': 'abc'}),
+        ]:
+            self.assertEqual(self.client.get(path, params).status_code, 400, path)
+
+
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Thời sự')
+        subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=category)
+        for i in range(3):
+            Content.objects.create(
+                title=f'Bài {i}', content='Nội dung', image_url='https://example.com/a.png',
+                subcategory=subcategory, category=category,
+            )
+        cls.content = Content.objects.first()
+        cls.comment = Comment.objects.create(title='Bình luận', content=cls.content)
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_responses_match_sync_views(self):
+        for path in [
+            'categories/', 'subcategories/', f'contents/{self.content.id}/',
+            f'comments/content/{self.content.id}/', f'comments/{self.comment.id}/', 'comments/0/',
+        ]:
+            expected = await self.async_client.get('/api/' + path)
+            response = await self.async_client.get('/api/async/' + path)
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(response.content, expected.content, path)
+
+        expected = (await self.async_client.get('/api/contents/all/', {'page_size': 2})).json()
+        response = (await self.async_client.get('/api/async/contents/all/', {'page_size': 2})).json()
+        self.assertEqual(response['data'], expected['data'])
+        self.assertEqual(response['pagination']['next_cursor'], expected['pagination']['next_cursor'])
+
+    async def test_read_only(self):
+        response = await self.async_client.post('/api/async/categories/')
+        self.assertEqual(response.status_code, 405)
+
+
+class ImageVariantTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+    def test_variants_are_generated_and_exposed(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, format='PNG')
+        category = Category.objects.create(name='Thời sự')
+        subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=category)
+        with self.captureOnCommitCallbacks() as callbacks:
+            content = Content.objects.create(
+                title='Ảnh', content='Nội dung', image_file=SimpleUploadedFile('a.png', buffer.getvalue()),
+                subcategory=subcategory, category=category,
+            )
+        # The image job and the feed update.
+        self.assertEqual(len(callbacks), 2)
+
+        variants = process_content_image(content.pk)
+        self.assertEqual(variants['source'], content.image_file.name)
+        self.assertEqual(sorted(variants['webp'], key=int), ['320', '640', '800'])
+        with default_storage.open(variants['jpeg']['320']) as file:
+            self.assertEqual(Image.open(file).size, (320, 160))
+
+        content.refresh_from_db()
+        data = ContentSerializer(content).data
+        self.assertEqual(data['image_variants']['webp']['640'], default_storage.url(variants['webp']['640']))
+        self.assertEqual(content_fast_serializer.serialize(Content.objects.all()), [data])
+
+
+class BackfillImageVariantsTests(TransactionTestCase):
+    # The command processes rows on worker threads, which only see committed data.
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        category = Category.objects.create(name='Thời sự')
+        subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=category)
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, format='PNG')
+        # bulk_create sends no post_save, so no variants are generated on the way in.
+        self.pending, self.done, self.remote = Content.objects.bulk_create([
+            Content(
+                title=title, content='Nội dung', subcategory=subcategory, category=category,
+                image_file=default_storage.save(f'images/{title}.png', io.BytesIO(buffer.getvalue())) if upload else None,
+                image_url=None if upload else 'https://example.com/a.png',
+            )
+            for title, upload in [('cho', True), ('xong', True), ('ngoai', False)]
+        ])
+        self.done_variants = process_content_image(self.done.pk)
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        call_command('backfill_image_variants', '--batch-size', '1', '--workers', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_writes_nothing(self):
+        files = sorted(default_storage.listdir('images')[1])
+        self.assertIn('Checked 2 images, would process 1, 0 failed.', self.backfill('--dry-run'))
+        self.assertEqual(Content.objects.get(pk=self.pending.pk).image_variants, {})
+        self.assertEqual(sorted(default_storage.listdir('images')[1]), files)
+
+    def test_backfill(self):
+        with mock.patch('home.management.commands.backfill_image_variants.process_content_image',
+                        wraps=process_content_image) as process:
+            self.assertIn('Checked 2 images, processed 1, 0 failed.', self.backfill())
+        self.assertEqual([call.args for call in process.call_args_list], [(self.pending.pk,)])
+
+        pending = Content.objects.get(pk=self.pending.pk)
+        self.assertEqual(pending.image_variants['source'], pending.image_file.name)
+        self.assertEqual(sorted(pending.image_variants['webp'], key=int), ['320', '640', '800'])
+        self.assertEqual(Content.objects.get(pk=self.done.pk).image_variants, self.done_variants)
+        self.assertIn('Checked 2 images, processed 0, 0 failed.', self.backfill())
+
+
+class ImageProxyTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.requests = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                cls.requests.append(self.path)
+                if self.path.startswith('/redirect'):
+                    self.send_response(302)
+                    self.send_header('Location', self.path.split('=', 1)[1])
+                    self.end_headers()
+                    return
+                time.sleep(0.05)
+                body = b'image ' + self.path.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png' if self.path != '/page' else 'text/html')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        cls.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.origin = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.requests.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = image_proxy.ImageCache(self.directory)
+        self.enterContext(mock.patch.object(views, 'image_cache', self.cache))
+        # The test origin is on loopback; every other private address stays refused.
+        self.is_public_address = image_proxy.is_public_address
+        self.enterContext(mock.patch.object(image_proxy, 'is_public_address', lambda ip: ip == '127.0.0.1'))
+        category = Category.objects.create(name='Thời sự')
+        self.subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=category)
+
+    def create_content(self, path):
+        return Content.objects.create(
+            title='Ảnh', content='Nội dung', image_url=self.origin + path, subcategory=self.subcategory,
+        )
+
+    def test_fetches_once_and_revalidates(self):
+        content = self.create_content('/a.png')
+        response = self.client.get(f'/api/contents/{content.pk}/image/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'image /a.png')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['ETag'], '"%s"' % hashlib.sha256(b'image /a.png').hexdigest())
+        self.assertIn('max-age', response['Cache-Control'])
+
+        response = self.client.get(f'/api/contents/{content.pk}/image/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.requests, ['/a.png'])
+
+    def test_concurrent_misses_share_one_fetch(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: self.cache.get(self.origin + '/b.png'), range(8)))
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual(self.requests, ['/b.png'])
+
+    def test_least_recently_used_blobs_are_evicted(self):
+        cache = image_proxy.ImageCache(self.directory, max_size=30)
+        first, _, _ = cache.get(self.origin + '/1.png')
+        second, _, _ = cache.get(self.origin + '/2.png')
+        os.utime(second, (0, 0))
+        cache.get(self.origin + '/3.png')
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/contents/0/image/').status_code, 404)
+        content = self.create_content('/page')
+        self.assertEqual(self.client.get(f'/api/contents/{content.pk}/image/').status_code, 502)
+
+    def test_private_addresses_refused(self):
+        port = self.server.server_port
+        for url in [
+            'http://169.254.169.254/latest/meta-data/',
+            'http://10.0.0.1/a.png',
+            f'http://127.0.0.2:{port}/a.png',
+            f'{self.origin}/redirect?to=http://127.0.0.2:{port}/a.png',
+            f'{self.origin}/redirect?to=file:///etc/passwd',
+        ]:
+            with self.assertRaises(image_proxy.ImageFetchError, msg=url):
+                image_proxy.fetch_image(url)
+        self.assertNotIn('/a.png', self.requests)
+
+        with mock.patch.object(image_proxy, 'is_public_address', self.is_public_address):
+            with self.assertRaises(image_proxy.ImageFetchError):
+                image_proxy.fetch_image(self.origin + '/a.png')
+        self.assertEqual(self.requests, [f'/redirect?to=http://127.0.0.2:{port}/a.png', '/redirect?to=file:///etc/passwd'])
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Thời sự')
+        subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=cls.category)
+        cls.content = Content.objects.create(
+            title='Bài viết', content='Nội dung', image_url='https://example.com/a.png',
+            subcategory=subcategory, category=cls.category,
+        )
+
+    def test_not_modified_with_one_query(self):
+        for path in [f'/api/contents/{self.content.pk}/', f'/api/categories/{self.category.pk}/']:
+            response = self.client.get(path)
+            with self.assertNumQueries(1):
+                response = self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+    def test_etag_follows_comment_count(self):
+        path = f'/api/contents/{self.content.pk}/'
+        etag = self.client.get(path)['ETag']
+        Content.objects.filter(pk=self.content.pk).update(comment_count=F('comment_count') + 1)
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['comment_count'], 1)
+
+    def test_last_modified_only_without_untimed_fields(self):
+        response = self.client.get(f'/api/categories/{self.category.pk}/')
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(f'/api/categories/{self.category.pk}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+        # comment_count and image_variants change without touching updated_date.
+        path = f'/api/contents/{self.content.pk}/'
+        self.assertNotIn('Last-Modified', self.client.get(path))
+        Content.objects.filter(pk=self.content.pk).update(comment_count=F('comment_count') + 1)
+        response = self.client.get(path, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+
+class ContentBulkCreateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Thời sự')
+        cls.subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=cls.category)
+
+    def item(self, title, **kwargs):
+        return {
+            'title': title, 'content': 'Nội dung', 'image_url': 'https://example.com/a.png',
+            'subcategory_id': self.subcategory.id, 'category_id': self.category.id, **kwargs,
+        }
+
+    def post_ndjson(self, body, content_type='application/x-ndjson'):
+        return self.client.post('/api/contents/bulk/', body, content_type=content_type)
+
+    def test_json_array(self):
+        response = self.client.post(
+            '/api/contents/bulk/', [self.item('Một'), self.item('Hai')], content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'created': 2, 'failed': 0, 'errors': []})
+        self.assertEqual(sorted(Content.objects.values_list('title', flat=True)), ['Hai', 'Một'])
+
+    def test_ndjson(self):
+        body = '\n'.join(json.dumps(item) for item in [self.item('Một'), self.item('Hai')]) + '\n\n'
+        for content_type in ['application/x-ndjson', 'application/x-ndjson; charset=utf-8']:
+            response = self.post_ndjson(body, content_type)
+            self.assertEqual(response.status_code, 201, content_type)
+            self.assertEqual(response.json()['created'], 2)
+        self.assertEqual(Content.objects.count(), 4)
+
+    def test_per_item_errors(self):
+        body = '\n'.join([
+            json.dumps(self.item('Một')),
+            json.dumps(self.item('Sai', subcategory_id=999999)),
+            json.dumps(['không phải object']),
+            '{không phải json',
+            json.dumps(self.item('Hai')),
+        ])
+        response = self.post_ndjson(body)
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual((data['created'], data['failed']), (2, 3))
+        self.assertEqual([error['index'] for error in data['errors']], [1, 2, 3])
+        self.assertIn('subcategory_id', data['errors'][0]['errors'])
+        self.assertEqual(sorted(Content.objects.values_list('title', flat=True)), ['Hai', 'Một'])
+
+        response = self.post_ndjson('{không phải json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['created'], 0)
+
+    def test_invalid_body(self):
+        self.assertEqual(self.post_ndjson(b'\xff\xfe').status_code, 400)
+        response = self.client.post('/api/contents/bulk/', self.item('Một'), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        with mock.patch.object(views, 'CONTENT_BULK_MAX_ITEMS', 1):
+            response = self.client.post(
+                '/api/contents/bulk/', [self.item('Một'), self.item('Hai')], content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Content.objects.exists())
+
+    def test_batch_size(self):
+        items = [self.item(f'Bài {i}') for i in range(5)]
+
+        def inserts(url):
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.post(url, items, content_type='application/json')
+            self.assertEqual(response.json()['created'], 5)
+            return sum(query['sql'].startswith('INSERT INTO "home_content"') for query in captured)
+
+        self.assertEqual(inserts('/api/contents/bulk/?batch_size=2'), 3)
+        self.assertEqual(inserts('/api/contents/bulk/?batch_size=abc'), 1)
+        with mock.patch.object(views, 'CONTENT_BULK_BATCH_SIZE', 4):
+            self.assertEqual(inserts('/api/contents/bulk/?batch_size=100'), 2)
+
+
+class CommentCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Thời sự')
+        subcategory = SubCategory.objects.create(sub='Thế giới', description='Tin thế giới', category=category)
+        cls.first, cls.second = [
+            Content.objects.create(
+                title=title, content='Nội dung', image_url='https://example.com/a.png',
+                subcategory=subcategory, category=category,
+            )
+            for title in ['Một', 'Hai']
+        ]
+
+    def counts(self):
+        return [Content.objects.get(pk=content.pk).comment_count for content in (self.first, self.second)]
+
+    def test_create_move_and_delete(self):
+        for title in ['A', 'B']:
+            response = self.client.post(f'/api/comments/content/{self.first.id}/', {'title': title, 'author': 'X'})
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.counts(), [2, 0])
+
+        comment = Comment.objects.filter(content=self.first).first()
+        response = self.client.put(
+            f'/api/comments/{comment.id}/', {'content_id': self.second.id}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(), [1, 1])
+
+        response = self.client.put(f'/api/comments/{comment.id}/', {'title': 'Sửa'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(), [1, 1])
+
+        self.assertEqual(self.client.delete(f'/api/comments/{comment.id}/').status_code, 204)
+        self.assertEqual(self.counts(), [1, 0])
+
+    def test_count_never_goes_negative(self):
+        comment = Comment.objects.create(title='A', content=self.first)
+        self.assertEqual(self.client.delete(f'/api/comments/{comment.id}/').status_code, 204)
+        self.assertEqual(self.counts(), [0, 0])
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_comment_counts', '--batch-size', '1', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reconcile(self):
+        Comment.objects.bulk_create([Comment(title=str(i), content=self.first) for i in range(3)])
+        Content.objects.filter(pk=self.second.pk).update(comment_count=5)
+
+        self.assertIn('Checked 2 contents, would fix 2.', self.reconcile('--dry-run'))
+        self.assertEqual(self.counts(), [0, 5])
+
+        self.assertIn('Checked 2 contents, fixed 2.', self.reconcile())
+        self.assertEqual(self.counts(), [3, 0])
+        self.assertIn('Checked 2 contents, fixed 0.', self.reconcile())
+
+
+class HomeFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.sport = Category.objects.create(name='Thể thao')
+        cls.economy = Category.objects.create(name='Kinh tế')
+        cls.football = SubCategory.objects.create(sub='Bóng đá', description='Bóng đá', category=cls.sport)
+        cls.market = SubCategory.objects.create(sub='Thị trường', description='Thị trường', category=cls.economy)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_content(self, title, subcategory, **kwargs):
+        return Content.objects.create(
+            title=title, content='Nội dung', image_url='https://example.com/a.png',
+            subcategory=subcategory, category=subcategory.category, **kwargs,
+        )
+
+    def titles(self, data):
+        return {
+            category['name']: (
+                [item['title'] for item in category['contents']],
+                {sub['sub']: [item['title'] for item in sub['contents']] for sub in category['subcategories']},
+            )
+            for category in data
+        }
+
+    def test_home_screen(self):
+        for i in range(HOME_FEED_SIZE + 2):
+            self.create_content(f'Bóng đá {i}', self.football)
+        self.create_content('Ẩn', self.market, active=False)
+        self.create_content('Giá vàng', self.market)
+
+        self.client.get('/api/home/')
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/home/').json()['data']
+        latest = [f'Bóng đá {i}' for i in range(HOME_FEED_SIZE + 1, 1, -1)]
+        self.assertEqual(self.titles(data), {
+            'Thể thao': (latest, {'Bóng đá': latest}),
+            'Kinh tế': (['Giá vàng'], {'Thị trường': ['Giá vàng']}),
+        })
+
+    def test_feeds_follow_saves_and_deletes(self):
+        first = self.create_content('Cũ', self.football)
+        self.client.get('/api/home/')
+        with self.captureOnCommitCallbacks(execute=True):
+            second = self.create_content('Mới', self.football)
+        second = Content.objects.get(pk=second.pk)
+
+        second.subcategory = self.market
+        second.category = self.economy
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.titles(self.client.get('/api/home/').json()['data']), {
+            'Thể thao': ([], {'Bóng đá': []}),
+            'Kinh tế': (['Mới'], {'Thị trường': ['Mới']}),
+        })
+
+
+    def test_feeds_change_on_commit(self):
+        self.create_content('Cũ', self.football)
+        self.client.get('/api/home/')
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.create_content('Mới', self.football)
+        self.assertEqual(self.titles(self.client.get('/api/home/').json()['data'])['Thể thao'], (['Cũ'], {'Bóng đá': ['Cũ']}))
+
+        for callback in callbacks:
+            callback()
+        latest = ['Mới', 'Cũ']
+        self.assertEqual(self.titles(self.client.get('/api/home/').json()['data'])['Thể thao'], (latest, {'Bóng đá': latest}))
+
+    def test_racing_rebuild_expires(self):
+        feed = ('subcategory', self.football.id)
+        old = self.create_content('Cũ', self.football)
+        stale = feeds.build_feed(*feed)
+        with self.captureOnCommitCallbacks(execute=True):
+            new = self.create_content('Mới', self.football)
+        # A rebuild that read the table before 'Mới' committed is stored after its update.
+        with mock.patch.object(feeds, 'build_feed', return_value=stale):
+            feeds.get_feeds([feed])
+        with self.captureOnCommitCallbacks(execute=True):
+            later = self.create_content('Sau', self.football)
+        self.assertEqual(feeds.get_feeds([feed])[feed], [later.pk, old.pk])
+
+        # Later writes do not extend the stale feed's life.
+        with mock.patch('time.time', return_value=time.time() + HOME_FEED_TIMEOUT + 1):
+            self.assertEqual(feeds.get_feeds([feed])[feed], [later.pk, new.pk, old.pk])
+
+    def test_unloaded_instance_reads_previous_state(self):
+        content = self.create_content('Bài', self.football)
+        self.client.get('/api/home/')
+        moved = Content(
+            pk=content.pk, title='Bài', content='Nội dung', image_url='https://example.com/a.png',
+            subcategory=self.market, category=self.economy, created_date=content.created_date,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.save()
+        self.assertEqual(self.titles(self.client.get('/api/home/').json()['data']), {
+            'Thể thao': ([], {'Bóng đá': []}),
+            'Kinh tế': (['Bài'], {'Thị trường': ['Bài']}),
+        })
+
+class PerformanceMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(mock.patch('middlewares.PERF_METRICS_ENABLED', True))
+        self.enterContext(mock.patch('utils.metrics.PERF_METRICS_ENABLED', True))
+        self.enterContext(mock.patch('utils.metrics.METRICS_TOKEN', 'bi-mat'))
+        for metric in metrics.METRICS:
+            metric.series.clear()
+        Category.objects.create(name='Thời sự')
+
+    def test_server_timing_and_metrics(self):
+        response = self.client.get('/api/categories/')
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="1 queries", cache;desc="0 hits, 1 misses"')
+        response = self.client.get('/api/categories/')
+        self.assertIn('desc="0 queries", cache;desc="1 hits, 0 misses"', response['Server-Timing'])
+
+        self.assertRegex(response['Server-Timing'], r'app;dur=[\d.]+;desc="outside the database"')
+
+        metrics = self.client.get('/metrics', headers={'Authorization': 'Bearer bi-mat'}).content.decode()
+        self.assertIn('http_request_duration_seconds_count{route="category-list",method="GET"} 2', metrics)
+        self.assertIn('http_request_app_duration_seconds_count{route="category-list"} 2', metrics)
+        self.assertIn('http_request_cache_lookups_total{route="category-list",result="hit"} 1', metrics)
+
+    def test_fast_response_is_timed(self):
+        with self.settings(FAST_JSON_RENDERING=True):
+            response = self.client.get('/api/categories/')
+        self.assertRegex(response['Server-Timing'], r'render;dur=[\d.]+, app;dur=[\d.]+')
+        self.assertGreater(metrics.render_duration.series[('category-list',)][1], 0)
+
+    async def test_async_views(self):
+        response = await self.async_client.get('/api/async/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('route="async-category-list"', metrics.render_prometheus())
+
+    def test_metrics_requires_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer sai'}).status_code, 401)
+        with mock.patch('utils.metrics.METRICS_TOKEN', ''):
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code, 404)
+
+    def test_disabled(self):
+        with mock.patch('middlewares.PERF_METRICS_ENABLED', False), \
+                mock.patch('utils.metrics.PERF_METRICS_ENABLED', False):
+            client = Client()
+            self.assertNotIn('Server-Timing', client.get('/api/categories/'))
+            self.assertEqual(client.get('/metrics').status_code, 404)
+
+
+class SoftDeleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='nguoidung', email='user@example.com')
+        RefreshToken.objects.bulk_create([
+            RefreshToken(user=cls.user, token=f'token-{i}', expires_at='2100-01-01T00:00:00Z') for i in range(5)
+        ])
+
+    def assigned_columns(self, sql):
+        assignments = sql.split(' SET ', 1)[1].split(' WHERE ', 1)[0].split(', ')
+        return sorted(assignment.split(' = ')[0].strip('"`') for assignment in assignments)
+
+    def test_bulk_soft_delete_and_restore(self):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(RefreshToken.objects.filter(user=self.user).soft_delete(), 5)
+        self.assertEqual(len(captured), 1)
+        self.assertEqual(self.assigned_columns(captured[0]['sql']), ['deleted_at', 'is_deleted'])
+        self.assertFalse(RefreshToken.objects.exists())
+        self.assertTrue(all(RefreshToken.all_objects.values_list('deleted_at', flat=True)))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(RefreshToken.all_objects.filter(token__in=['token-0', 'token-1']).restore(), 2)
+        self.assertEqual(sorted(RefreshToken.objects.values_list('token', flat=True)), ['token-0', 'token-1'])
+
+    def test_instance_delete_writes_two_columns(self):
+        token = RefreshToken.objects.first()
+        with CaptureQueriesContext(connection) as captured:
+            token.delete()
+        self.assertEqual(len(captured), 1)
+        self.assertEqual(self.assigned_columns(captured[0]['sql']), ['deleted_at', 'is_deleted'])
+        token.restore()
+        self.assertEqual(RefreshToken.objects.count(), 5)
+
+
+class GetOrComputeTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self, value='fresh', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_concurrent_misses_compute_once(self):
+        compute = self.compute(delay=0.2)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: get_or_compute('stampede', compute, 60), range(8)))
+        self.assertEqual(results, ['fresh'] * 8)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_another_caller_recomputes(self):
+        get_or_compute('stale', self.compute('old'), 60)
+        entry = json.loads(cache.get('stale'))
+        entry['expires'] = time.time() - 1
+        cache.set('stale', json.dumps(entry))
+
+        with cache_lock('compute:stale'):
+            self.assertEqual(get_or_compute('stale', self.compute('new'), 60), 'old')
+        self.assertEqual(get_or_compute('stale', self.compute('new'), 60), 'new')
+        self.assertEqual(self.calls, 2)
+
+    def test_early_expiration(self):
+        get_or_compute('early', self.compute('old'), 60)
+        entry = json.loads(cache.get('early'))
+        entry.update(expires=time.time() + 1, delta=0.5)
+        cache.set('early', json.dumps(entry))
+
+        self.assertEqual(get_or_compute('early', self.compute('new'), 60, beta=0), 'old')
+        self.assertEqual(get_or_compute('early', self.compute('new'), 60, beta=1000), 'new')
+
+    def test_async_shares_entries(self):
+        async def compute():
+            return 'async'
+
+        self.assertEqual(asyncio.run(aget_or_compute('shared', compute, 60)), 'async')
+        self.assertEqual(get_or_compute('shared', self.compute(), 60), 'async')
+        self.assertEqual(self.calls, 0)
@@ -1,12 +1,33 @@
+import json
+
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from rest_framework.serializers import as_serializer_error
 from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
 
 from auths import serializers
 from .models import Category, SubCategory, Content, Comment
 from .serializers import CategorySerializer, SubCategorySerializer, ContentSerializer, CommentSerializer
+from .serializers import category_fast_serializer, subcategory_fast_serializer, content_fast_serializer
+from .feeds import get_feeds, invalidate_feeds
+from .search import SearchPagination, search_contents
+from utils.pagination import CursorPagination
+from utils.related import prime_related
+from utils.conditional import conditional_detail
+from utils.fast_serializer import fast_response
+from utils.image_proxy import ImageFetchError, image_cache
+from utils.redis import bump_version, read_through
+from PythonWeb.settings import TAXONOMY_CACHE_TIMEOUT, CONTENT_BULK_MAX_ITEMS, CONTENT_BULK_BATCH_SIZE
+from PythonWeb.settings import IMAGE_PROXY_MAX_AGE
 
 category_request_body = openapi.Schema(
     type=openapi.TYPE_OBJECT,
@@ -73,6 +94,41 @@ content_update_body = openapi.Schema(
     required=['title', 'content', 'subcategory'],
 )
 
+content_list_parameters = [
+    openapi.Parameter('cursor', openapi.IN_QUERY, description='Cursor returned as next_cursor by the previous page', type=openapi.TYPE_STRING),
+    openapi.Parameter('page_size', openapi.IN_QUERY, description='Page size (max 50)', type=openapi.TYPE_INTEGER),
+    openapi.Parameter('category', openapi.IN_QUERY, description='Filter by Category ID', type=openapi.TYPE_INTEGER),
+    openapi.Parameter('subcategory', openapi.IN_QUERY, description='Filter by SubCategory ID', type=openapi.TYPE_INTEGER),
+    openapi.Parameter('active', openapi.IN_QUERY, description='Filter by active flag', type=openapi.TYPE_BOOLEAN),
+]
+
+content_search_parameters = [
+    openapi.Parameter('q', openapi.IN_QUERY, description='Search text', type=openapi.TYPE_STRING, required=True),
+] + content_list_parameters
+
+
+def _id_param(params, name):
+    try:
+        return int(params[name])
+    except ValueError:
+        raise ValidationError({name: ['A valid integer is required.']})
+
+
+def content_filters(params):
+    filters = {}
+    if params.get('category'):
+        filters['category_id'] = _id_param(params, 'category')
+    if params.get('subcategory'):
+        filters['subcategory_id'] = _id_param(params, 'subcategory')
+    active = params.get('active')
+    if active is not None and active != '':
+        filters['active'] = active.lower() in ('1', 'true', 'yes')
+    return filters
+
+
+def filter_contents(queryset, params):
+    return queryset.filter(**content_filters(params))
+
 
 
 @swagger_auto_schema(
@@ -88,9 +144,14 @@ content_update_body = openapi.Schema(
 def category_view(request):
     
     if request.method == 'GET':
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if settings.FAST_JSON_RENDERING:
+            compute = lambda: category_fast_serializer.serialize(Category.objects.all())
+        else:
+            compute = lambda: CategorySerializer(Category.objects.all(), many=True).data
+        data = read_through('categories', ['category'], compute, TAXONOMY_CACHE_TIMEOUT)
+        if settings.FAST_JSON_RENDERING:
+            return fast_response(data)
+        return Response(data, status=status.HTTP_200_OK)
 
     elif request.method == 'POST':
         serializer = CategorySerializer(data=request.data)
@@ -100,9 +161,10 @@ def category_view(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@conditional_detail(Category.objects.all(), ['updated_date'])
 @swagger_auto_schema(
     method='get',
-    responses={200: CategorySerializer, 404: "Category not found"}
+    responses={200: CategorySerializer, 304: "Not modified", 404: "Category not found"}
 )
 @swagger_auto_schema(
     method='put',
@@ -150,9 +212,14 @@ def category_detail(request, pk):
 def subcategory_view(request):
     
     if request.method == 'GET':
-        subcategories = SubCategory.objects.all()
-        serializer = SubCategorySerializer(subcategories, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if settings.FAST_JSON_RENDERING:
+            compute = lambda: subcategory_fast_serializer.serialize(SubCategory.objects.all())
+        else:
+            compute = lambda: SubCategorySerializer(SubCategory.objects.all(), many=True).data
+        data = read_through('subcategories', ['subcategory'], compute, TAXONOMY_CACHE_TIMEOUT)
+        if settings.FAST_JSON_RENDERING:
+            return fast_response(data)
+        return Response(data, status=status.HTTP_200_OK)
 
     elif request.method == 'POST':
         serializer = SubCategorySerializer(data=request.data)
@@ -197,9 +264,10 @@ def subcategory_detail(request, pk):
         subcategory.delete()
         return Response({'message': 'SubCategory deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
 
+@conditional_detail(Content.objects.all(), ['updated_date', 'comment_count', 'image_variants'])
 @swagger_auto_schema(
     method='get',
-    responses={200: ContentSerializer, 404: "Content not found"}
+    responses={200: ContentSerializer, 304: "Not modified", 404: "Content not found"}
 )
 @swagger_auto_schema(
     method='put',
@@ -259,22 +327,114 @@ def content_create_by_subcategory(request):
             {"errors": "Something went wrong.", "details": str(e)},
             status=status.HTTP_400_BAD_REQUEST
         )
+def parse_bulk_items(request):
+    """
+    Items of a bulk request: a JSON array, or one JSON object per line for NDJSON.
+    Lines that are not valid JSON are returned as errors.
+    """
+    if request.content_type.split(';')[0].strip() in ('application/x-ndjson', 'application/ndjson'):
+        try:
+            lines = request.body.decode('utf-8').splitlines()
+        except UnicodeDecodeError:
+            raise ValidationError({'errors': 'NDJSON body is not valid UTF-8.'})
+        items, errors = [], []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                errors.append({'index': len(items), 'errors': {'non_field_errors': [f'Invalid JSON: {e}']}})
+                items.append(None)
+        return items, errors
+    if not isinstance(request.data, list):
+        raise ValidationError({'errors': 'Expected a JSON array or NDJSON body.'})
+    return list(request.data), []
+
+
+@swagger_auto_schema(
+    method='post',
+    request_body=openapi.Schema(type=openapi.TYPE_ARRAY, items=content_request_body),
+    manual_parameters=[
+        openapi.Parameter('batch_size', openapi.IN_QUERY, description='Rows per INSERT', type=openapi.TYPE_INTEGER),
+    ],
+    responses={
+        201: openapi.Response("Contents created; per-item errors for rejected items"),
+        400: openapi.Response("Invalid body or no valid item"),
+    }
+)
+@api_view(['POST'])
+def content_bulk_create(request):
+    """
+    API tạo nhiều Content cùng lúc (JSON array hoặc NDJSON).
+    """
+    items, errors = parse_bulk_items(request)
+    if len(items) > CONTENT_BULK_MAX_ITEMS:
+        return Response(
+            {"errors": f"At most {CONTENT_BULK_MAX_ITEMS} items per request."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        batch_size = int(request.query_params.get('batch_size', CONTENT_BULK_BATCH_SIZE))
+    except ValueError:
+        batch_size = CONTENT_BULK_BATCH_SIZE
+    batch_size = max(1, min(batch_size, CONTENT_BULK_BATCH_SIZE))
+
+    # One serializer validates every item, like ListSerializer does with its child,
+    # but a rejected item does not discard the valid ones.
+    serializer = ContentSerializer()
+    prime_related(serializer, items)
+    contents = []
+    for index, item in enumerate(items):
+        if item is None:
+            continue
+        try:
+            contents.append(Content(**serializer.run_validation(item)))
+        except (ValidationError, DjangoValidationError) as e:
+            errors.append({'index': index, 'errors': as_serializer_error(e)})
+
+    if contents:
+        with transaction.atomic():
+            Content.objects.bulk_create(contents, batch_size=batch_size)
+        # bulk_create sends no post_save signals.
+        bump_version('content')
+        invalidate_feeds(contents)
+
+    errors.sort(key=lambda error: error['index'])
+    return Response(
+        {'created': len(contents), 'failed': len(errors), 'errors': errors},
+        status=status.HTTP_201_CREATED if contents else status.HTTP_400_BAD_REQUEST
+    )
+
+
 @swagger_auto_schema(
     method='get',
+    manual_parameters=content_list_parameters,
     responses={
-        200: openapi.Response("List of all Content", ContentSerializer(many=True)),
+        200: openapi.Response("Cursor-paginated list of Content", ContentSerializer(many=True)),
+        404: openapi.Response("Invalid cursor"),
         500: openapi.Response("Internal Server Error"),
     }
 )
 @api_view(['GET'])
 def content_get_all(request):
     """
-    API để lấy tất cả Content.
+    API để lấy danh sách Content, phân trang theo cursor (created_date, id).
     """
     try:
-        contents = Content.objects.all()
-        serializer = ContentSerializer(contents, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        contents = filter_contents(
+            ContentSerializer.setup_eager_loading(Content.objects.all()), request.query_params
+        )
+        paginator = CursorPagination()
+        if settings.FAST_JSON_RENDERING:
+            page = paginator.paginate_queryset(content_fast_serializer.values(contents), request)
+            data = content_fast_serializer.to_representation(page)
+            return fast_response(paginator.get_paginated_response(data).data)
+        page = paginator.paginate_queryset(contents, request)
+        serializer = ContentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+    except APIException:
+        raise
     except Exception as e:
         return Response(
             {"errors": "Something went wrong.", "details": str(e)},
@@ -282,6 +442,13 @@ def content_get_all(request):
         )
     
     
+def change_comment_count(content_id, delta):
+    contents = Content.objects.filter(pk=content_id)
+    if delta < 0:
+        contents = contents.filter(comment_count__gte=-delta)
+    contents.update(comment_count=F('comment_count') + delta)
+
+
 @swagger_auto_schema(
     method='get',
     responses={200: CommentSerializer(many=True), 404: "Content not found"}
@@ -298,7 +465,7 @@ def add_comment(request, content_id):
     except Content.DoesNotExist:
         return Response({'detail': 'Content not found'}, status=status.HTTP_404_NOT_FOUND)
     if request.method == 'GET':
-        comments = content.comments.all()  
+        comments = CommentSerializer.setup_eager_loading(content.comments.order_by('created_date'))
         serializer = CommentSerializer(comments, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     elif request.method == 'POST':
@@ -306,7 +473,9 @@ def add_comment(request, content_id):
         data['content'] = content.id  
         serializer = CommentSerializer(data=data)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save(content=content)
+                change_comment_count(content.id, 1)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 @swagger_auto_schema(
@@ -325,13 +494,14 @@ def add_comment(request, content_id):
 @api_view(['GET', 'PUT', 'DELETE'])
 def comment_detail(request, id):
     try:
-        comment = Comment.objects.get(id=id)
+        comment = CommentSerializer.setup_eager_loading(Comment.objects.all()).get(id=id)
     except Comment.DoesNotExist:
         return Response({'error': 'Comment not found'}, status=status.HTTP_404_NOT_FOUND)
     if request.method == 'GET':
         serializer = CommentSerializer(comment)
         return Response(serializer.data, status=status.HTTP_200_OK)
     elif request.method == 'PUT':
+        old_content_id = comment.content_id
         content_id = request.data.get('content_id')  
         if content_id:
             try:
@@ -341,9 +511,137 @@ def comment_detail(request, id):
                 return Response({'error': 'Content not found'}, status=status.HTTP_400_BAD_REQUEST)
         serializer = CommentSerializer(comment, data=request.data, partial=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
+                if comment.content_id != old_content_id:
+                    change_comment_count(old_content_id, -1)
+                    change_comment_count(comment.content_id, 1)
             return Response(serializer.data, status=status.HTTP_200_OK)  
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)  
     elif request.method == 'DELETE':
-        comment.delete()
-        return Response({'message': 'Comment deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        with transaction.atomic():
+            comment.delete()
+            change_comment_count(comment.content_id, -1)
+        return Response({'message': 'Comment deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
+
+
+def home_taxonomy():
+    categories = list(Category.objects.order_by('id').values('id', 'name'))
+    subcategories = SubCategory.objects.filter(active=True).order_by('id').values('id', 'sub', 'category_id')
+    by_category = {category['id']: [] for category in categories}
+    for subcategory in subcategories:
+        if subcategory['category_id'] in by_category:
+            by_category[subcategory['category_id']].append({'id': subcategory['id'], 'sub': subcategory['sub']})
+    for category in categories:
+        category['subcategories'] = by_category[category['id']]
+    return categories
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: openapi.Response("Latest active contents per category and subcategory")}
+)
+@api_view(['GET'])
+def home_view(request):
+    """
+    API để lấy dữ liệu màn hình chính: các bài mới nhất theo từng category và subcategory
+    """
+    categories = read_through('home:taxonomy', ['category', 'subcategory'], home_taxonomy, TAXONOMY_CACHE_TIMEOUT)
+    feeds = get_feeds(
+        [('category', category['id']) for category in categories]
+        + [('subcategory', subcategory['id']) for category in categories for subcategory in category['subcategories']]
+    )
+    ids = {pk for pks in feeds.values() for pk in pks}
+    rows = content_fast_serializer.values(Content.objects.filter(id__in=ids, active=True))
+    contents = {item['id']: item for item in content_fast_serializer.to_representation(rows)}
+
+    def items(kind, id):
+        return [contents[pk] for pk in feeds[(kind, id)] if pk in contents]
+
+    data = [
+        {
+            'id': category['id'],
+            'name': category['name'],
+            'contents': items('category', category['id']),
+            'subcategories': [
+                {'id': subcategory['id'], 'sub': subcategory['sub'], 'contents': items('subcategory', subcategory['id'])}
+                for subcategory in category['subcategories']
+            ],
+        }
+        for category in categories
+    ]
+    data = {'success': True, 'message': 'successful', 'data': data}
+    if settings.FAST_JSON_RENDERING:
+        return fast_response(data)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={
+        200: openapi.Response("Image bytes, served from the local cache"),
+        304: openapi.Response("Not modified"),
+        404: openapi.Response("Content not found or has no image_url"),
+        502: openapi.Response("Remote image could not be fetched"),
+    }
+)
+@api_view(['GET'])
+def content_image(request, pk):
+    """
+    API để lấy ảnh image_url của content qua bộ nhớ đệm của server
+    """
+    image_url = Content.objects.filter(pk=pk).values_list('image_url', flat=True).first()
+    if not image_url:
+        return Response({'error': 'Content not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        file, digest, content_type = image_cache.open(image_url)
+    except ImageFetchError:
+        return Response({'error': 'Could not fetch image'}, status=status.HTTP_502_BAD_GATEWAY)
+
+    etag = f'"{digest}"'
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        file.close()
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(file, content_type=content_type)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=IMAGE_PROXY_MAX_AGE)
+    return response
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=content_search_parameters,
+    responses={
+        200: openapi.Response("Content ranked by relevance, with category/subcategory facets", ContentSerializer(many=True)),
+        400: openapi.Response("Missing search text"),
+        404: openapi.Response("Invalid cursor"),
+    }
+)
+@api_view(['GET'])
+def content_search(request):
+    """
+    API tìm kiếm Content theo title và nội dung, sắp xếp theo độ liên quan.
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        filters = content_filters(request.query_params)
+    except ValidationError:
+        return Response({'error': 'Invalid filter'}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = SearchPagination()
+    # Facets describe the whole result set, so they are only computed for the first page.
+    with_facets = not request.query_params.get(paginator.cursor_query_param)
+    results, facets = search_contents(query, filters, paginator, request, with_facets)
+
+    data = []
+    for content, score in results:
+        item = ContentSerializer(content).data
+        item['score'] = score
+        data.append(item)
+    response = paginator.get_paginated_response(data)
+    response.data['facets'] = facets
+    return response
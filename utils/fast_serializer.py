@@ -0,0 +1,129 @@
+import json
+import time
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from django.http import HttpResponse
+from rest_framework import ISO_8601, serializers, status
+from rest_framework.settings import api_settings
+
+from utils.metrics import current_request, record_render
+
+# Marker for DateTimeFields rendered in the current timezone, resolved once per call.
+DATETIME = object()
+
+
+class FastSerializer:
+    """
+    Read-only fast path for a plain ModelSerializer.
+
+    The serializer's readable fields are compiled once into a plan of
+    (output key, column, converter). Rows are then read with `.values()` and
+    converted without building model instances or walking the serializer per
+    row. The output is identical to `serializer_class(queryset, many=True).data`.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plan = None
+
+    @property
+    def plan(self):
+        if self._plan is None:
+            self._plan = self.compile()
+        return self._plan
+
+    @property
+    def columns(self):
+        return [column for _, column, _ in self.plan]
+
+    def compile(self):
+        if self.serializer_class.to_representation is not serializers.ModelSerializer.to_representation:
+            raise ImproperlyConfigured(f'{self.serializer_class.__name__} overrides to_representation')
+
+        model = self.serializer_class.Meta.model
+        plan = []
+        for field in self.serializer_class()._readable_fields:
+            if isinstance(field, serializers.BaseSerializer) or '.' in field.source or field.source == '*':
+                raise ImproperlyConfigured(f'{field.field_name} cannot be served from .values()')
+            model_field = model._meta.get_field(field.source)
+
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                plan.append((field.field_name, model_field.attname, None))
+            elif isinstance(field, serializers.FileField):
+                plan.append((field.field_name, model_field.attname, self._file_url(model_field.storage)))
+            elif isinstance(field, serializers.DateTimeField) and self._is_plain_datetime(field):
+                plan.append((field.field_name, model_field.attname, DATETIME))
+            else:
+                plan.append((field.field_name, model_field.attname, field.to_representation))
+        return plan
+
+    @staticmethod
+    def _is_plain_datetime(field):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        return (
+            settings.USE_TZ and not hasattr(field, 'timezone')
+            and isinstance(output_format, str) and output_format.lower() == ISO_8601
+        )
+
+    @staticmethod
+    def _datetime_iso(tz):
+        def to_representation(value):
+            if timezone.is_naive(value):
+                value = timezone.make_aware(value, tz)
+            value = value.astimezone(tz).isoformat()
+            if value.endswith('+00:00'):
+                value = value[:-6] + 'Z'
+            return value
+        return to_representation
+
+    @staticmethod
+    def _file_url(storage):
+        def to_representation(name):
+            return storage.url(name) if name else None
+        return to_representation
+
+    def values(self, queryset):
+        return queryset.values(*self.columns)
+
+    def to_representation(self, rows):
+        datetime_iso = self._datetime_iso(timezone.get_current_timezone())
+        plan = [
+            (name, column, datetime_iso if convert is DATETIME else convert)
+            for name, column, convert in self.plan
+        ]
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in plan:
+                value = row[column]
+                item[name] = value if value is None or convert is None else convert(value)
+            data.append(item)
+        return data
+
+    def serialize(self, queryset):
+        return self.to_representation(self.values(queryset))
+
+
+def render_json(data):
+    """
+    Same bytes as DRF's JSONRenderer for already-primitive data.
+    """
+    ret = json.dumps(
+        data,
+        ensure_ascii=not api_settings.UNICODE_JSON,
+        allow_nan=not api_settings.STRICT_JSON,
+        separators=(',', ':') if api_settings.COMPACT_JSON else (', ', ': '),
+    )
+    ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+    return ret.encode()
+
+
+def fast_response(data, status_code=status.HTTP_200_OK):
+    if current_request.get() is None:
+        body = render_json(data)
+    else:
+        start = time.perf_counter()
+        body = render_json(data)
+        record_render(time.perf_counter() - start)
+    return HttpResponse(body, content_type='application/json', status=status_code)
@@ -0,0 +1,75 @@
+import threading
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from PythonWeb.settings import PASSWORD_HASHING_WORKERS
+
+# Password hashing is CPU-bound and releases the GIL. At most PASSWORD_HASHING_WORKERS
+# hashes run at once, however many requests wait; the waiting threads block.
+hashing_slots = threading.BoundedSemaphore(PASSWORD_HASHING_WORKERS)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+
+    @property
+    def work_factor(self):
+        return settings.SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.SCRYPT_PARALLELISM
+
+
+def _check(raw_password, encoded):
+    rehashed = []
+    valid = hashers.check_password(
+        raw_password, encoded, setter=lambda raw: rehashed.append(hashers.make_password(raw))
+    )
+    return valid, rehashed[0] if rehashed else None
+
+
+def check_password(user, raw_password):
+    """
+    user.check_password() run in the calling thread once a hashing slot is free.
+    A hash made with another policy or older parameters is replaced by one with
+    the current policy when the password is right.
+    """
+    with hashing_slots:
+        valid, rehashed = _check(raw_password, user.password)
+    if rehashed:
+        user.password = rehashed
+        user.save(update_fields=['password'])
+    return valid
+
+
+def make_password(raw_password):
+    with hashing_slots:
+        return hashers.make_password(raw_password)
+
@@ -0,0 +1,245 @@
+import hashlib
+import http.client
+import ipaddress
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+
+from PythonWeb.settings import (
+    IMAGE_PROXY_CACHE_DIR, IMAGE_PROXY_CACHE_SIZE, IMAGE_PROXY_MAX_AGE, IMAGE_PROXY_MAX_IMAGE_SIZE,
+    IMAGE_PROXY_TIMEOUT,
+)
+
+
+class ImageFetchError(Exception):
+    pass
+
+
+def is_public_address(ip):
+    address = ipaddress.ip_address(ip.split('%', 1)[0])
+    if getattr(address, 'ipv4_mapped', None):
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def _create_public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None, *args):
+    # Resolve once, refuse loopback, link-local, private and reserved addresses,
+    # then connect to the checked address so DNS can't swap it in between.
+    host, port = address
+    try:
+        resolved = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    except socket.gaierror as e:
+        raise ImageFetchError(f'Cannot resolve {host}') from e
+    for ip in resolved:
+        if not is_public_address(ip):
+            raise ImageFetchError(f'Refusing to fetch from {host} ({ip})')
+    error = None
+    for ip in resolved:
+        try:
+            return socket.create_connection((ip, port), timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _create_public_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _create_public_connection
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, request):
+        return self.do_open(_PublicHTTPConnection, request)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, request):
+        return self.do_open(_PublicHTTPSConnection, request, context=self._context)
+
+
+class _RedirectHandler(urllib.request.HTTPRedirectHandler):
+    max_redirections = 3
+
+    def redirect_request(self, request, fp, code, msg, headers, newurl):
+        # The target is connected through the handlers above, so its address is checked too.
+        if not newurl.lower().startswith(('http://', 'https://')):
+            raise ImageFetchError(f'Unsupported redirect: {newurl}')
+        return super().redirect_request(request, fp, code, msg, headers, newurl)
+
+
+# No ProxyHandler: a proxy would connect on our behalf and bypass the address checks.
+opener = urllib.request.OpenerDirector()
+for handler in (_PublicHTTPHandler(), _PublicHTTPSHandler(), _RedirectHandler(),
+                urllib.request.HTTPDefaultErrorHandler(), urllib.request.HTTPErrorProcessor()):
+    opener.add_handler(handler)
+
+
+def fetch_image(url, timeout=IMAGE_PROXY_TIMEOUT, max_size=IMAGE_PROXY_MAX_IMAGE_SIZE):
+    """
+    Download `url` and return (body, content type). Only http(s) images up to
+    `max_size` bytes on public addresses are accepted, redirects included.
+    """
+    if not url.lower().startswith(('http://', 'https://')):
+        raise ImageFetchError(f'Unsupported URL: {url}')
+    request = urllib.request.Request(url, headers={'User-Agent': 'news-app-image-proxy'})
+    try:
+        with opener.open(request, timeout=timeout) as response:
+            content_type = response.headers.get_content_type()
+            if not content_type.startswith('image/'):
+                raise ImageFetchError(f'Not an image: {content_type}')
+            body = response.read(max_size + 1)
+    except OSError as e:
+        raise ImageFetchError(str(e)) from e
+    if len(body) > max_size:
+        raise ImageFetchError('Image too large')
+    return body, content_type
+
+
+class ImageCache:
+    """
+    Content-addressed disk cache of remote images.
+
+    Bodies are stored once under blobs/ by their SHA-256, which doubles as a
+    strong ETag. urls/ maps the hash of each remote URL to its blob and
+    content type. When the blobs exceed `max_size` bytes the least recently
+    served ones are removed. Concurrent misses for the same URL share one
+    download.
+    """
+
+    def __init__(self, directory=IMAGE_PROXY_CACHE_DIR, max_size=IMAGE_PROXY_CACHE_SIZE,
+                 max_age=IMAGE_PROXY_MAX_AGE, fetch=fetch_image):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self.fetch = fetch
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.size = None
+
+    def blob_path(self, digest):
+        return os.path.join(self.directory, 'blobs', digest[:2], digest)
+
+    def url_path(self, url):
+        return os.path.join(self.directory, 'urls', hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def get(self, url):
+        """
+        Return (path, digest, content type) of the cached copy of `url`,
+        downloading it first if needed.
+        """
+        entry = self.lookup(url)
+        if entry is not None:
+            return entry
+
+        with self.lock:
+            future = self.in_flight.get(url)
+            leader = future is None
+            if leader:
+                future = self.in_flight[url] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self.store(url, *self.fetch(url)))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                del self.in_flight[url]
+        return future.result()
+
+    def open(self, url):
+        """
+        Like get(), but returns an open file. Retries if the blob is evicted
+        between the lookup and the open.
+        """
+        for _ in range(3):
+            path, digest, content_type = self.get(url)
+            try:
+                return open(path, 'rb'), digest, content_type
+            except FileNotFoundError:
+                continue
+        raise ImageFetchError(f'Could not cache {url}')
+
+    def lookup(self, url):
+        try:
+            with open(self.url_path(url)) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if entry['fetched_at'] + self.max_age < time.time():
+            return None
+        path = self.blob_path(entry['digest'])
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path, entry['digest'], entry['content_type']
+
+    def store(self, url, body, content_type):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            self._write(path, body)
+            with self.lock:
+                if self.size is not None:
+                    self.size += len(body)
+        self._write(self.url_path(url), json.dumps({
+            'digest': digest, 'content_type': content_type, 'fetched_at': time.time(),
+        }).encode())
+        self.evict(keep=path)
+        return path, digest, content_type
+
+    @staticmethod
+    def _write(path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp, path)
+
+    def _blobs(self):
+        blobs = []
+        for root, _, names in os.walk(os.path.join(self.directory, 'blobs')):
+            for name in names:
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+        return blobs
+
+    def evict(self, keep=None):
+        with self.lock:
+            if self.size is not None and self.size <= self.max_size:
+                return
+            blobs = self._blobs()
+            self.size = sum(size for _, size, _ in blobs)
+            for _, size, path in sorted(blobs):
+                if self.size <= self.max_size:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self.size -= size
+
+
+image_cache = ImageCache()
@@ -0,0 +1,63 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from PythonWeb.settings import IMAGE_VARIANT_WIDTHS, IMAGE_VARIANT_FORMATS, IMAGE_VARIANT_QUALITY, IMAGE_VARIANT_WORKERS
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+executor = ThreadPoolExecutor(max_workers=IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants')
+
+
+def variant_name(name, width, format):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{stem}_{width}.{EXTENSIONS[format]}')
+
+
+def encode(image, format, quality):
+    if format == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format=format.upper(), quality=quality, optimize=format == 'jpeg')
+    return buffer.getvalue()
+
+
+def generate_variants(storage, name, widths=IMAGE_VARIANT_WIDTHS, formats=IMAGE_VARIANT_FORMATS,
+                      quality=IMAGE_VARIANT_QUALITY):
+    """
+    Resize the image stored as `name` to each width (never upscaling) and save
+    one file per width and format next to it, under `variants/`.
+
+    Returns {'source': name, <format>: {<width>: <storage name>}}.
+    """
+    with storage.open(name, 'rb') as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+
+    variants = {'source': name}
+    for format in formats:
+        variants[format] = {}
+    for width in sorted(set(min(width, original.width) for width in widths)):
+        height = max(1, round(original.height * width / original.width))
+        image = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+        for format in formats:
+            target = variant_name(name, width, format)
+            if storage.exists(target):
+                storage.delete(target)
+            variants[format][str(width)] = storage.save(target, ContentFile(encode(image, format, quality)))
+    return variants
+
+
+def variant_files(variants):
+    return {name for key, names in variants.items() if key != 'source' for name in names.values()}
+
+
+def delete_variants(storage, names):
+    for name in names:
+        storage.delete(name)
@@ -1,4 +1,6 @@
 import datetime
+import hashlib
+import uuid
 import jwt
 from PythonWeb.settings import JWT_SECRET
 
@@ -26,6 +28,7 @@ def generate_refresh_token(id):
             'iat': current_time,
             'nbf': current_time,
             'exp': expiration_time,
+            'jti': uuid.uuid4().hex,
         },
         key=JWT_SECRET,
         algorithm="HS256",
@@ -40,3 +43,10 @@ def decode_token(token):
         algorithms=["HS256"],
         options={"verify_exp": True},
     )
+
+
+def hash_token(token):
+    """
+    Fixed-length digest refresh tokens are stored and looked up by.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework.renderers import JSONRenderer
+
+from PythonWeb.settings import PERF_METRICS_ENABLED, METRICS_TOKEN
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Stats of the request being handled, None outside PerformanceMiddleware.
+current_request = ContextVar('current_request_metrics', default=None)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'cache_hits', 'cache_misses', 'render_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """
+        connection.execute_wrapper() hook counting queries and their time.
+        """
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def record_cache(hit):
+    stats = current_request.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def record_render(seconds):
+    stats = current_request.get()
+    if stats is not None:
+        stats.render_time += seconds
+
+
+class Histogram:
+
+    def __init__(self, name, documentation, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted(self.series.items())
+            series = [(labels, list(counts), total) for labels, (counts, total) in series]
+        for labels, counts, total in series:
+            label_text = ','.join(f'{name}="{_escape(label)}"' for name, label in zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels, value=1):
+        if value:
+            with self.lock:
+                self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self.lock:
+            series = sorted(self.series.items())
+        for labels, value in series:
+            label_text = ','.join(f'{name}="{_escape(label)}"' for name, label in zip(self.labels, labels))
+            lines.append(f'{self.name}{{{label_text}}} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+request_duration = Histogram('http_request_duration_seconds', 'Wall time per request.', ('route', 'method'))
+db_queries = Histogram('http_request_db_queries', 'Database queries per request.', ('route',), COUNT_BUCKETS)
+db_duration = Histogram('http_request_db_duration_seconds', 'Database time per request.', ('route',))
+app_duration = Histogram(
+    'http_request_app_duration_seconds', 'Time outside the database per request: view, serialization and rendering.',
+    ('route',),
+)
+render_duration = Histogram('http_request_render_duration_seconds', 'JSON rendering time per request.', ('route',))
+cache_requests = Counter('http_request_cache_lookups_total', 'utils.redis cache lookups.', ('route', 'result'))
+responses = Counter('http_responses_total', 'Responses by status code.', ('route', 'method', 'status'))
+
+METRICS = (request_duration, db_queries, db_duration, app_duration, render_duration, cache_requests, responses)
+
+
+def observe_request(route, method, status_code, duration, stats):
+    request_duration.observe((route, method), duration)
+    db_queries.observe((route,), stats.queries)
+    db_duration.observe((route,), stats.db_time)
+    app_duration.observe((route,), max(duration - stats.db_time, 0.0))
+    render_duration.observe((route,), stats.render_time)
+    cache_requests.inc((route, 'hit'), stats.cache_hits)
+    cache_requests.inc((route, 'miss'), stats.cache_misses)
+    responses.inc((route, method, str(status_code)))
+
+
+def server_timing(duration, stats):
+    return ', '.join([
+        f'total;dur={duration * 1000:.2f}',
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries"',
+        f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+        f'render;dur={stats.render_time * 1000:.2f}',
+        f'app;dur={max(duration - stats.db_time, 0.0) * 1000:.2f};desc="outside the database"',
+    ])
+
+
+def render_prometheus():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    if not PERF_METRICS_ENABLED or not METRICS_TOKEN:
+        raise Http404
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {METRICS_TOKEN}'):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that adds its time to the request's render metrics.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if current_request.get() is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        start = time.perf_counter()
+        try:
+            return super().render(data, accepted_media_type, renderer_context)
+        finally:
+            record_render(time.perf_counter() - start)
@@ -1,6 +1,56 @@
+import base64
+import json
 from math import ceil
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def paginated_envelope(data, pagination):
+    return Response({
+        'success': True,
+        'message': 'successful',
+        'data': data,
+        'pagination': pagination,
+    })
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise NotFound('Invalid cursor')
+    if not isinstance(values, list) or not all(isinstance(value, (str, int, float)) for value in values):
+        raise NotFound('Invalid cursor')
+    return values
+
+
+def keyset_filter(ordering, values):
+    """
+    Build the WHERE clause selecting rows strictly after `values` for `ordering`.
+    The leading field gets a plain range predicate so the index can seek on it.
+    """
+    condition = None
+    for field, value in reversed(list(zip(ordering, values))):
+        name = field.lstrip('-')
+        op = 'lt' if field.startswith('-') else 'gt'
+        after = Q(**{f'{name}__{op}': value})
+        condition = after if condition is None else after | (Q(**{name: value}) & condition)
+
+    first = ordering[0]
+    name = first.lstrip('-')
+    op = 'lte' if first.startswith('-') else 'gte'
+    return Q(**{f'{name}__{op}': values[0]}) & condition
+
 
 class Pagination(PageNumberPagination):
     page_size = 25  
@@ -28,3 +78,129 @@ class Pagination(PageNumberPagination):
                 'previous': self.get_previous_link()  
             }
         })
+
+
+class CursorPagination(BasePagination):
+    """
+    Keyset pagination on `ordering`, wrapped in the same envelope as `Pagination`.
+    Every page is a single index range scan with LIMIT, and no COUNT(*) is run.
+    """
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    ordering = ('-created_date', '-id')
+    # Ordering fields that are annotations rather than model fields, with the
+    # type their cursor values are converted to.
+    annotation_types = {}
+
+    @staticmethod
+    def get_query_params(request):
+        # DRF requests expose query_params, plain Django (async) views only GET.
+        return getattr(request, 'query_params', request.GET)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(self.get_query_params(request).get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_cursor_values(self, request, model):
+        """
+        The cursor's values converted to the types of the ordering fields. A
+        tampered cursor raises NotFound here, before any data is read.
+        """
+        cursor = self.get_query_params(request).get(self.cursor_query_param)
+        if not cursor:
+            return None
+        values = decode_cursor(cursor)
+        if len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        try:
+            return [self.to_field_value(model, field.lstrip('-'), value) for field, value in zip(self.ordering, values)]
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound('Invalid cursor')
+
+    def to_field_value(self, model, name, value):
+        if name in self.annotation_types:
+            return self.annotation_types[name](value)
+        return model._meta.get_field(name).to_python(value)
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        values = self.get_cursor_values(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, values))
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.get_page_queryset(queryset, request)
+        return self.take_page(list(page), self.get_instance_values)
+
+    async def apaginate_queryset(self, queryset, request):
+        page = self.get_page_queryset(queryset, request)
+        return self.take_page([instance async for instance in page], self.get_instance_values)
+
+    def paginate_sorted(self, items, request, key, model):
+        """
+        Same as paginate_queryset for a list of `model` rows already sorted by
+        `ordering`; `key(item)` returns the item's ordering values.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        values = self.get_cursor_values(request, model)
+        if values is not None:
+            items = (item for item in items if self.is_after(key(item), values))
+
+        results = []
+        for item in items:
+            results.append(item)
+            if len(results) > self.page_size:
+                break
+        return self.take_page(results, key)
+
+    def is_after(self, item_values, cursor_values):
+        for field, value, cursor_value in zip(self.ordering, item_values, cursor_values):
+            if value != cursor_value:
+                return value < cursor_value if field.startswith('-') else value > cursor_value
+        return False
+
+    def take_page(self, results, key):
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_cursor = self.get_cursor(key(results[-1])) if self.has_next else None
+        return results
+
+    def get_instance_values(self, instance):
+        values = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            values.append(instance[name] if isinstance(instance, dict) else getattr(instance, name))
+        return values
+
+    def get_cursor(self, values):
+        return encode_cursor([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return paginated_envelope(data, {
+            'page_size': self.page_size,
+            'next_cursor': self.next_cursor,
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+        })
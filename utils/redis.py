@@ -1,14 +1,215 @@
+import asyncio
+import hashlib
 import json
+import math
+import random
+import threading
+import time as _time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
 from django.core.cache import cache
+from utils.metrics import record_cache
+from PythonWeb.settings import CACHE_EARLY_EXPIRATION_BETA, CACHE_STALE_TIME, CACHE_COMPUTE_TIMEOUT, AUTH_LEGACY_WHITELIST_KEYS
 
 def set_cache(key, data, time):
     cache.set(key, json.dumps(data), timeout=time)
 
 def get_cache(key):
     cached_data = cache.get(key)
+    record_cache(bool(cached_data))
     if cached_data:
         return json.loads(cached_data) 
     return None
 
 def remove_cache(key):
     cache.delete(key)
+
+
+def _version_key(name):
+    return f'version:{name}'
+
+def get_versions(names):
+    """
+    Current version of each name. Missing versions are seeded from the clock so a
+    version key that was evicted never comes back with a number already used.
+    """
+    keys = {_version_key(name): name for name in names}
+    versions = cache.get_many(list(keys))
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(_time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+async def aget_versions(names):
+    keys = {_version_key(name): name for name in names}
+    versions = await cache.aget_many(list(keys))
+    for key in keys:
+        if key not in versions:
+            await cache.aadd(key, int(_time.time() * 1000), timeout=None)
+            versions[key] = await cache.aget(key)
+    return [versions[key] for key in keys]
+
+def bump_version(name):
+    key = _version_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(_time.time() * 1000), timeout=None)
+
+def read_through(key, versions, compute, time):
+    """
+    Return the cached value of `compute()` for the current `versions`.
+    Bumping any of the versions makes the next read recompute it.
+    """
+    suffix = ':'.join(str(version) for version in get_versions(versions))
+    return get_or_compute(f'{key}:{suffix}', compute, time)
+
+async def aread_through(key, versions, compute, time):
+    """
+    Async read_through(); `compute` is a coroutine function. Shares keys with read_through().
+    """
+    suffix = ':'.join(str(version) for version in await aget_versions(versions))
+    return await aget_or_compute(f'{key}:{suffix}', compute, time)
+
+
+@contextmanager
+def cache_lock(name, timeout=5, wait=0.5):
+    """
+    Best-effort lock shared by every process using the cache. Yields False if
+    it could not be taken within `wait` seconds; expires after `timeout`.
+    """
+    key = f'lock:{name}'
+    deadline = _time.monotonic() + wait
+    acquired = cache.add(key, 1, timeout=timeout)
+    while not acquired and _time.monotonic() < deadline:
+        _time.sleep(0.01)
+        acquired = cache.add(key, 1, timeout=timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+@asynccontextmanager
+async def acache_lock(name, timeout=5, wait=0.5):
+    key = f'lock:{name}'
+    deadline = _time.monotonic() + wait
+    acquired = await cache.aadd(key, 1, timeout=timeout)
+    while not acquired and _time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+        acquired = await cache.aadd(key, 1, timeout=timeout)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            await cache.adelete(key)
+
+
+# get_or_compute() stores {'value', 'delta', 'expires'}: the value, how long
+# computing it took and when it goes stale. The cache keeps it CACHE_STALE_TIME
+# longer so a stale value can be served while one caller recomputes it.
+
+def _load(raw):
+    if raw is None:
+        return None
+    entry = json.loads(raw)
+    return entry if isinstance(entry, dict) and 'expires' in entry else None
+
+def _should_refresh(entry, beta):
+    # Probabilistic early expiration (XFetch): the closer to `expires` and the
+    # slower the value is to compute, the likelier a read recomputes it early.
+    return _time.time() - entry['delta'] * beta * math.log(1 - random.random()) >= entry['expires']
+
+def _dump(value, delta, time):
+    return json.dumps({'value': value, 'delta': delta, 'expires': _time.time() + time})
+
+# Misses being computed in this process, so concurrent threads wait for one computation.
+_flights = {}
+_flights_lock = threading.Lock()
+
+def get_or_compute(key, compute, time, beta=CACHE_EARLY_EXPIRATION_BETA, stale_time=CACHE_STALE_TIME):
+    """
+    Cached value of `compute()` under `key`, fresh for `time` seconds.
+
+    Only one caller recomputes a key at a time: threads in this process share
+    one computation and processes coordinate through cache_lock(). A value near
+    expiry is sometimes recomputed early, and one that has expired is still
+    served for `stale_time` seconds while a single caller refreshes it.
+    """
+    entry = _load(cache.get(key))
+    record_cache(entry is not None)
+    if entry is not None:
+        if not _should_refresh(entry, beta):
+            return entry['value']
+        with cache_lock(f'compute:{key}', timeout=CACHE_COMPUTE_TIMEOUT, wait=0) as acquired:
+            if not acquired:
+                return entry['value']
+            return _compute_and_store(key, compute, time, stale_time)
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Future()
+    if not leader:
+        return flight.result()
+
+    try:
+        with cache_lock(f'compute:{key}', timeout=CACHE_COMPUTE_TIMEOUT, wait=CACHE_COMPUTE_TIMEOUT) as acquired:
+            # Another process may have stored it while this one waited for the lock.
+            entry = _load(cache.get(key))
+            value = entry['value'] if entry is not None else _compute_and_store(key, compute, time, stale_time)
+        flight.set_result(value)
+        return value
+    except BaseException as error:
+        flight.set_exception(error)
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+
+def _compute_and_store(key, compute, time, stale_time):
+    start = _time.perf_counter()
+    value = compute()
+    cache.set(key, _dump(value, _time.perf_counter() - start, time), timeout=time + stale_time)
+    return value
+
+async def aget_or_compute(key, compute, time, beta=CACHE_EARLY_EXPIRATION_BETA, stale_time=CACHE_STALE_TIME):
+    """
+    Async get_or_compute(); `compute` is a coroutine function. Shares keys with get_or_compute().
+    """
+    entry = _load(await cache.aget(key))
+    record_cache(entry is not None)
+    if entry is not None and not _should_refresh(entry, beta):
+        return entry['value']
+
+    wait = 0 if entry is not None else CACHE_COMPUTE_TIMEOUT
+    async with acache_lock(f'compute:{key}', timeout=CACHE_COMPUTE_TIMEOUT, wait=wait) as acquired:
+        if not acquired and entry is not None:
+            return entry['value']
+        if entry is None:
+            stored = _load(await cache.aget(key))
+            if stored is not None:
+                return stored['value']
+        start = _time.perf_counter()
+        value = await compute()
+        await cache.aset(key, _dump(value, _time.perf_counter() - start, time), timeout=time + stale_time)
+        return value
+
+
+def token_key(token):
+    return 'access_token:' + hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+def whitelist_token(token, time):
+    cache.set(token_key(token), 1, timeout=time)
+
+def is_token_whitelisted(token):
+    if cache.has_key(token_key(token)):
+        return True
+    # Tokens issued before the hashed keys were whitelisted under the full JWT.
+    return AUTH_LEGACY_WHITELIST_KEYS and cache.has_key(f'access_token:{token}')
+
+def revoke_token_keys(keys):
+    cache.delete_many(keys)
@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import serializers
+
+
+class RelatedObjectResolver:
+    """
+    Request-scoped cache of related objects by primary key.
+
+    Keys primed before validation are fetched together with the first lookup,
+    with one `IN` query per model. Every later lookup is served from memory.
+    """
+
+    def __init__(self):
+        self.objects = defaultdict(dict)
+        self.pending = defaultdict(set)
+        self.querysets = {}
+
+    def prime(self, queryset, pks):
+        model = queryset.model
+        self.querysets.setdefault(model, queryset)
+        self.pending[model].update(pk for pk in pks if pk not in self.objects[model])
+
+    def get(self, queryset, pk):
+        model = queryset.model
+        objects = self.objects[model]
+        if pk not in objects:
+            self.prime(queryset, [pk])
+            self.fetch(model)
+        return objects[pk]
+
+    def fetch(self, model):
+        pks = self.pending.pop(model, set())
+        if not pks:
+            return
+        found = self.querysets[model].in_bulk(pks)
+        for pk in pks:
+            self.objects[model][pk] = found.get(pk)
+
+
+def get_resolver(context):
+    """
+    The resolver shared by one serializer pass, or by the whole request when
+    the request is in the serializer context.
+    """
+    request = context.get('request')
+    holder = getattr(request, '_request', request)
+    if holder is not None:
+        resolver = getattr(holder, 'related_resolver', None)
+        if resolver is None:
+            resolver = holder.related_resolver = RelatedObjectResolver()
+        return resolver
+    return context.setdefault('related_resolver', RelatedObjectResolver())
+
+
+class BatchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves through the RelatedObjectResolver,
+    so a serializer pass runs one query per model instead of one per value.
+    """
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError(data)
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        return self.get_queryset().model._meta.pk.to_python(data)
+
+    def prime(self, resolver, values):
+        pks = []
+        for value in values:
+            try:
+                pks.append(self.to_pk(value))
+            except (TypeError, ValueError, DjangoValidationError, serializers.ValidationError):
+                continue
+        resolver.prime(self.get_queryset(), pks)
+
+    def to_internal_value(self, data):
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = get_resolver(self.context).get(self.get_queryset(), pk)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+def prime_related(serializer, items):
+    """
+    Queue the primary keys referenced by `items` on every batched field of
+    `serializer`, so validating all items costs one query per model.
+    """
+    resolver = get_resolver(serializer.context)
+    for field in serializer.fields.values():
+        if isinstance(field, BatchedPrimaryKeyRelatedField) and not field.read_only:
+            field.prime(resolver, [
+                item[field.field_name] for item in items
+                if isinstance(item, dict) and item.get(field.field_name) is not None
+            ])
+
+
+class BatchedListSerializer(serializers.ListSerializer):
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            prime_related(self.child, data)
+        return super().to_internal_value(data)